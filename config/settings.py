@@ -41,6 +41,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',  # búsqueda por trigramas en el catálogo de medicamentos
     #apps de dependencias
     'rest_framework',
     'corsheaders',
@@ -108,6 +109,7 @@ DATABASES = {
 }
 
 AUTH_USER_MODEL = "users.User"
+AUTHENTICATION_BACKENDS = ["users.backends.EmailBackend"]  # login con perfiles y roles en una sola query
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -149,11 +151,27 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 CORS_ALLOW_ALL_ORIGINS = True  # TODO: CAMBIAR ESTA COSA CUANDO SE TENGA PENSADO HOSTEAR LA API
 
+#Cache compartido entre procesos (p. ej. django.core.cache.backends.redis.RedisCache en producción)
+CACHES = {
+    "default": {
+        "BACKEND": config("CACHE_BACKEND", default="django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": config("CACHE_LOCATION", default="vitalis"),
+    }
+}
+SHARED_ACCESS_CACHE_TIMEOUT = config("SHARED_ACCESS_CACHE_TIMEOUT", default=0, cast=int)  # segundos que vive el grafo de accesos en cache (0 = sin cache; requiere un cache compartido)
+
 #Configuración para Django Rest Framework
+API_PAGE_SIZE = config("API_PAGE_SIZE", default=50, cast=int)
+API_MAX_PAGE_SIZE = config("API_MAX_PAGE_SIZE", default=200, cast=int)
+DRUG_SEARCH_MAX_RESULTS = config("DRUG_SEARCH_MAX_RESULTS", default=20, cast=int)  # tope de resultados de /drugs/search/
+DRUG_CATALOG_CACHE_TIMEOUT = config("DRUG_CATALOG_CACHE_TIMEOUT", default=86400, cast=int)  # segundos que vive en cache el catálogo completo de una versión
+
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "users.authentication.JWTAuthentication",  # roles y perfiles en la misma query que el usuario
     ),
+    "DEFAULT_PAGINATION_CLASS": "utils.pagination.KeysetPagination",  # paginación por cursor en todos los listados
+    "PAGE_SIZE": API_PAGE_SIZE,
 }
 
 
@@ -164,7 +182,32 @@ SIMPLE_JWT = {
     "ROTATE_REFRESH_TOKENS": True,                    # cada refresh devuelve uno nuevo
     "BLACKLIST_AFTER_ROTATION": True,                 # invalida los anteriores
     "AUTH_HEADER_TYPES": ("Bearer",),
+    "TOKEN_REFRESH_SERIALIZER": "users.tokens.TokenRefreshSerializer",  # renueva roles y perfiles en los claims
 }
+JWT_BLACKLIST_CACHE_SIZE = config("JWT_BLACKLIST_CACHE_SIZE", default=10000, cast=int)  # JTIs en blacklist recordados por proceso
+JWT_PURGE_BATCH_SIZE = config("JWT_PURGE_BATCH_SIZE", default=1000, cast=int)  # tokens expirados borrados por transacción
+JWT_PURGE_INTERVAL_MINUTES = config("JWT_PURGE_INTERVAL_MINUTES", default=0, cast=int)  # purga periódica en run_reminder_worker (0 = desactivada)
+JWT_STATELESS_AUTH = config("JWT_STATELESS_AUTH", default=False, cast=bool)  # autenticar desde los claims del token, sin leer el usuario
+
+#Configuración del scheduler de recordatorios
+REMINDERS_SCHEDULER_MODE = config("REMINDERS_SCHEDULER_MODE", default="interval")  # "interval" (poll cada 5s) o "timer" (por eventos)
+REMINDERS_TIMER_LOOKAHEAD_SECONDS = config("REMINDERS_TIMER_LOOKAHEAD_SECONDS", default=60, cast=int)  # con Postgres (LISTEN/NOTIFY); otros backends usan 5s
+REMINDERS_BATCH_SIZE = config("REMINDERS_BATCH_SIZE", default=500, cast=int)      # recordatorios reclamados por lote (un tick reclama varios)
+REMINDERS_TICK_BUDGET_SECONDS = config("REMINDERS_TICK_BUDGET_SECONDS", default=5, cast=float)  # tiempo máximo de un tick reclamando lotes
+REMINDERS_LEASE_SECONDS = config("REMINDERS_LEASE_SECONDS", default=60, cast=int)  # tiempo antes de liberar un reclamo huérfano
+REMINDERS_DISPATCH_CONCURRENCY = config("REMINDERS_DISPATCH_CONCURRENCY", default=4, cast=int)  # dispatchers del outbox en paralelo
+REMINDERS_ASYNC_PUSH = config("REMINDERS_ASYNC_PUSH", default=False, cast=bool)  # envío asíncrono HTTP/2 en lugar de fcm-django
+REMINDERS_PUSH_CONCURRENCY = config("REMINDERS_PUSH_CONCURRENCY", default=100, cast=int)  # envíos simultáneos por worker
+REMINDERS_FCM_BASE_URL = config("REMINDERS_FCM_BASE_URL", default="https://fcm.googleapis.com")
+REMINDERS_COALESCE_MISSED_TRIGGERS = config("REMINDERS_COALESCE_MISSED_TRIGGERS", default=True, cast=bool)  # tras una caída, un solo aviso por recordatorio
+REMINDERS_OUTBOX_MAX_ATTEMPTS = config("REMINDERS_OUTBOX_MAX_ATTEMPTS", default=5, cast=int)
+REMINDERS_OUTBOX_RETENTION_DAYS = config("REMINDERS_OUTBOX_RETENTION_DAYS", default=7, cast=int)  # filas enviadas o fallidas que se conservan
+REMINDERS_OUTBOX_PURGE_BATCH_SIZE = config("REMINDERS_OUTBOX_PURGE_BATCH_SIZE", default=1000, cast=int)  # filas del outbox borradas por transacción
+REMINDERS_OUTBOX_PURGE_INTERVAL_MINUTES = config("REMINDERS_OUTBOX_PURGE_INTERVAL_MINUTES", default=60, cast=int)  # purga periódica en run_reminder_worker (0 = desactivada)
+REMINDERS_BULK_CONFIRM_MAX_ITEMS = config("REMINDERS_BULK_CONFIRM_MAX_ITEMS", default=200, cast=int)  # confirmaciones por petición en confirm-batch
+SYNC_OVERLAP_SECONDS = config("SYNC_OVERLAP_SECONDS", default=60, cast=int)  # ventana repetida antes del token de /sync/
+SYNC_TOMBSTONE_RETENTION_DAYS = config("SYNC_TOMBSTONE_RETENTION_DAYS", default=30, cast=int)  # tokens más viejos reciben una sincronización completa
+SYNC_PAGE_SIZE = config("SYNC_PAGE_SIZE", default=500, cast=int)  # elementos por lista en cada página de /sync/
 
 #Configuración para Firebase
 
@@ -0,0 +1,69 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from .models import DeletedDrug, Drug, DrugCatalogVersion
+from .serializers import DrugWithVariantsSerializer
+
+CACHE_KEY = "drug_catalog:{}"
+CATALOG_ID = 1
+
+
+def current():
+    """Fila con la versión actual del catálogo (una query por PK)."""
+    catalog, _ = DrugCatalogVersion.objects.get_or_create(pk=CATALOG_ID)
+    return catalog
+
+
+def bump_version():
+    """
+    Sube la versión del catálogo y la devuelve. La fila queda bloqueada
+    hasta el commit, así dos escrituras concurrentes no comparten versión.
+    updated_at avanza al menos un segundo por versión: Last-Modified tiene
+    resolución de segundos y un cliente que solo manda If-Modified-Since no
+    debe recibir un 304 de la versión anterior.
+    Al confirmar se borra del cache el catálogo de la versión anterior.
+    """
+    with transaction.atomic():
+        row = DrugCatalogVersion.objects.select_for_update().filter(pk=CATALOG_ID).first()
+        if row is None:
+            DrugCatalogVersion.objects.get_or_create(pk=CATALOG_ID)
+            return bump_version()
+        version = row.version + 1
+        updated_at = max(timezone.now(), row.updated_at + timedelta(seconds=1))
+        DrugCatalogVersion.objects.filter(pk=CATALOG_ID).update(version=version, updated_at=updated_at)
+    transaction.on_commit(lambda: cache.delete(CACHE_KEY.format(version - 1)))
+    return version
+
+
+def serialize(drugs):
+    return DrugWithVariantsSerializer(drugs.prefetch_related("variants").order_by("id"), many=True).data
+
+
+def full_catalog(version):
+    """
+    Catálogo completo serializado para esa versión. Se guarda en cache por
+    versión, así que un cambio en el catálogo nunca sirve datos viejos; las
+    versiones anteriores se borran al subir la versión y, si alguna queda
+    (p. ej. repoblada por una petición en curso), expira con
+    DRUG_CATALOG_CACHE_TIMEOUT.
+    """
+    key = CACHE_KEY.format(version)
+    data = cache.get(key)
+    if data is None:
+        data = serialize(Drug.objects.all())
+        cache.set(key, data, settings.DRUG_CATALOG_CACHE_TIMEOUT)
+    return data
+
+
+def changes_since(version):
+    """Medicamentos cambiados y ids borrados después de `version`."""
+    return {
+        "changed": serialize(Drug.objects.filter(catalog_version__gt=version)),
+        "deleted": list(
+            DeletedDrug.objects.filter(catalog_version__gt=version).values_list("drug_id", flat=True)
+        ),
+    }
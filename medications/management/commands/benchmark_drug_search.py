@@ -0,0 +1,75 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from medications.models import Drug, DrugVariant
+from medications.search import search_drugs
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide la latencia de medications.search sobre un catálogo sintético. "
+        "Los datos se crean dentro de una transacción que se revierte al terminar."
+    )
+
+    QUERIES = ["amox", "paracet", "ibupro", "omepra", "loratad", "metfor", "salbut", "laboratorio 12", "tabletas 500"]
+
+    def add_arguments(self, parser):
+        parser.add_argument("--drugs", type=int, default=20_000, help="Medicamentos a generar")
+        parser.add_argument("--variants", type=int, default=5, help="Variantes por medicamento")
+        parser.add_argument("--repeat", type=int, default=20, help="Repeticiones por término")
+        parser.add_argument("--budget-ms", type=float, default=20.0, help="p95 máximo permitido, en milisegundos")
+
+    def handle(self, *args, **options):
+        budget = options["budget_ms"]
+
+        with transaction.atomic():
+            self._seed(options["drugs"], options["variants"])
+            if connection.vendor == "postgresql":
+                with connection.cursor() as cursor:
+                    cursor.execute(f"ANALYZE {Drug._meta.db_table}")
+                    cursor.execute(f"ANALYZE {DrugVariant._meta.db_table}")
+
+            timings = []
+            for query in self.QUERIES:
+                for _ in range(options["repeat"]):
+                    start = time.perf_counter()
+                    list(search_drugs(query))
+                    timings.append((time.perf_counter() - start) * 1000)
+
+            transaction.set_rollback(True)
+
+        timings.sort()
+        p50 = statistics.median(timings)
+        p95 = timings[int(len(timings) * 0.95) - 1]
+        self.stdout.write(
+            f"{options['drugs'] * options['variants']} variantes, {len(timings)} búsquedas: "
+            f"p50 {p50:.1f} ms, p95 {p95:.1f} ms"
+        )
+        if p95 > budget:
+            self.stderr.write(self.style.ERROR(f"p95 por encima de {budget} ms"))
+            raise SystemExit(1)
+        self.stdout.write(self.style.SUCCESS(f"p95 dentro de {budget} ms"))
+
+    def _seed(self, drugs, variants):
+        roots = ["amoxicilina", "paracetamol", "ibuprofeno", "omeprazol", "loratadina", "metformina", "salbutamol"]
+        forms = ["tabletas", "cápsulas", "jarabe", "suspensión", "inyectable"]
+        created = Drug.objects.bulk_create(
+            [Drug(name=f"{roots[i % len(roots)]} {i}", catalog_version=1) for i in range(drugs)],
+            batch_size=5000,
+        )
+        DrugVariant.objects.bulk_create(
+            [
+                DrugVariant(
+                    drug=drug,
+                    variant_name=f"{forms[j % len(forms)]} {(j + 1) * 250} mg",
+                    dosage=f"{(j + 1) * 250} mg",
+                    manufacturer=f"laboratorio {i % 500}",
+                )
+                for i, drug in enumerate(created)
+                for j in range(variants)
+            ],
+            batch_size=5000,
+        )
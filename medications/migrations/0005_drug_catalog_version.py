@@ -0,0 +1,42 @@
+# Generated by Django 5.2.6 on 2026-10-17 17:16
+
+from django.db import migrations, models
+
+
+def start_catalog(apps, schema_editor):
+    # Los medicamentos existentes forman la versión 1 del catálogo
+    apps.get_model("medications", "DrugCatalogVersion").objects.create(pk=1, version=1)
+    apps.get_model("medications", "Drug").objects.update(catalog_version=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medications', '0004_alter_medication_doctor'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeletedDrug',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('drug_id', models.BigIntegerField()),
+                ('catalog_version', models.PositiveBigIntegerField(db_index=True)),
+                ('deleted_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DrugCatalogVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveBigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='drug',
+            name='catalog_version',
+            field=models.PositiveBigIntegerField(db_index=True, default=0),
+        ),
+        migrations.RunPython(start_catalog, migrations.RunPython.noop),
+    ]
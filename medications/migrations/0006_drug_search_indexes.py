@@ -0,0 +1,36 @@
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+# Índices GIN de trigramas para medications.search. Solo existen en PostgreSQL;
+# en otras bases de datos la búsqueda usa icontains sin índice.
+TRIGRAM_INDEXES = [
+    ("drug_name_trgm_idx", "medications_drug", "name"),
+    ("drugvariant_name_trgm_idx", "medications_drugvariant", "variant_name"),
+    ("drugvariant_manufacturer_trgm_idx", "medications_drugvariant", "manufacturer"),
+]
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for name, table, column in TRIGRAM_INDEXES:
+        schema_editor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} USING gin ({column} gin_trgm_ops)")
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for name, _, _ in TRIGRAM_INDEXES:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medications', '0005_drug_catalog_version'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
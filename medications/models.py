@@ -11,11 +11,32 @@ class Drug(models.Model):
     description = models.TextField(blank=True)
     prescription_required = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Versión del catálogo en la que cambió por última vez (él o sus variantes)
+    catalog_version = models.PositiveBigIntegerField(default=0, db_index=True)
 
     def __str__(self):
         return self.name
 
 
+class DrugCatalogVersion(models.Model):
+    """Fila única con la versión actual del catálogo de medicamentos."""
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Catálogo v{self.version}"
+
+
+class DeletedDrug(models.Model):
+    """Marca de borrado para que los clientes quiten el medicamento en el modo delta."""
+    drug_id = models.BigIntegerField()
+    catalog_version = models.PositiveBigIntegerField(db_index=True)
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Drug {self.drug_id} borrado en v{self.catalog_version}"
+
+
 class DrugVariant(models.Model):
     """Variantes de un medicamento: presentación, dosis, fabricante."""
     drug = models.ForeignKey(Drug, on_delete=models.CASCADE, related_name="variants")
@@ -48,10 +69,16 @@ class Medication(models.Model):
     start_date = models.DateField()
     end_date = models.DateField()
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     # Nuevo:
     created_by_patient = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            # Cambios desde un token de sincronización (reminders.sync)
+            models.Index(fields=["patient", "updated_at"], name="medication_patient_updated_idx"),
+        ]
 
     def __str__(self):
         return f"{self.drug_variant} for {self.patient}"
@@ -0,0 +1,61 @@
+from django.conf import settings
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db import connection, models
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Drug, DrugVariant
+
+
+def _matching_drug_ids(lookup, query):
+    """
+    Ids de medicamentos cuyo nombre, variante o fabricante coinciden.
+    UNION de tres ramas para que cada una use su propio índice.
+    """
+    by_name = Drug.objects.filter(**{f"name__{lookup}": query}).order_by().values("pk")
+    by_variant = DrugVariant.objects.filter(**{f"variant_name__{lookup}": query}).order_by().values("drug_id")
+    by_manufacturer = DrugVariant.objects.filter(**{f"manufacturer__{lookup}": query}).order_by().values("drug_id")
+    return by_name.union(by_variant, by_manufacturer)
+
+
+def search_drugs(query, limit=None):
+    """
+    Busca medicamentos por nombre, nombre de variante o fabricante.
+
+    En PostgreSQL usa similitud de trigramas por palabra (pg_trgm, índices GIN
+    de la migración 0006): tolera errores de escritura y sirve para
+    autocompletar. Los resultados se ordenan primero por coincidencia de
+    prefijo en el nombre y luego por similitud. En otras bases de datos
+    (SQLite en tests) cae a icontains con el mismo orden por prefijo.
+    """
+    max_results = settings.DRUG_SEARCH_MAX_RESULTS
+    limit = min(limit, max_results) if limit and limit > 0 else max_results
+    prefix = models.Case(
+        models.When(name__istartswith=query, then=models.Value(1)),
+        default=models.Value(0),
+    )
+
+    if connection.vendor == "postgresql":
+        variant_similarity = (
+            DrugVariant.objects.filter(drug=models.OuterRef("pk"))
+            .annotate(
+                similarity=Greatest(
+                    TrigramWordSimilarity(query, "variant_name"),
+                    TrigramWordSimilarity(query, Coalesce("manufacturer", models.Value(""))),
+                )
+            )
+            .order_by("-similarity")
+            .values("similarity")[:1]
+        )
+        drugs = Drug.objects.filter(pk__in=_matching_drug_ids("trigram_word_similar", query)).annotate(
+            prefix=prefix,
+            similarity=Greatest(
+                TrigramWordSimilarity(query, "name"),
+                Coalesce(models.Subquery(variant_similarity), models.Value(0.0)),
+            ),
+        )
+        ordering = ("-prefix", "-similarity", "name")
+    else:
+        drugs = Drug.objects.filter(pk__in=_matching_drug_ids("icontains", query)).annotate(prefix=prefix)
+        ordering = ("-prefix", "name")
+
+    return drugs.order_by(*ordering).prefetch_related("variants")[:limit]
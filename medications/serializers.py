@@ -7,6 +7,7 @@ class DrugSerializer(serializers.ModelSerializer):
     class Meta:
         model = Drug
         fields = "__all__"
+        read_only_fields = ["catalog_version"]
 
 
 class DrugVariantSerializer(serializers.ModelSerializer):
@@ -72,7 +73,7 @@ class MedicationSerializer(serializers.ModelSerializer):
         # ============================
         # 2) SI ES PACIENTE → SELF MEDICATION
         # ============================
-        if not hasattr(user,"doctor_profile"):
+        if not user.has_profile("doctor"):
             # Solo aplica cuando el paciente crea su propia medicación
             attrs["patient"] = user
             attrs["created_by_patient"] = True
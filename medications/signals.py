@@ -0,0 +1,30 @@
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from . import catalog
+from .models import DeletedDrug, Drug, DrugVariant
+
+
+@receiver(pre_save, sender=Drug)
+def bump_catalog_on_drug_save(sender, instance, **kwargs):
+    """
+    Cada alta o edición de un medicamento sube la versión del catálogo.
+    """
+    instance.catalog_version = catalog.bump_version()
+
+
+@receiver(post_delete, sender=Drug)
+def bump_catalog_on_drug_delete(sender, instance, **kwargs):
+    """
+    Deja una marca de borrado para el modo delta (?since=).
+    """
+    DeletedDrug.objects.create(drug_id=instance.pk, catalog_version=catalog.bump_version())
+
+
+@receiver(post_save, sender=DrugVariant)
+@receiver(post_delete, sender=DrugVariant)
+def bump_catalog_on_variant_change(sender, instance, **kwargs):
+    """
+    Un cambio en una variante marca su medicamento como modificado.
+    """
+    Drug.objects.filter(pk=instance.drug_id).update(catalog_version=catalog.bump_version())
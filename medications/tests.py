@@ -1,3 +1,118 @@
-from django.test import TestCase
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from users.models import User
+
+from . import catalog
+from .models import Drug, DrugVariant
+
+
+class CatalogCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_previous_version_is_evicted_on_bump(self):
+        Drug.objects.create(name="amoxicilina")
+        version = catalog.current().version
+        catalog.full_catalog(version)
+        self.assertIsNotNone(cache.get(catalog.CACHE_KEY.format(version)))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Drug.objects.create(name="paracetamol")
+        new_version = catalog.current().version
+
+        self.assertEqual(new_version, version + 1)
+        self.assertIsNone(cache.get(catalog.CACHE_KEY.format(version)))
+        self.assertEqual(len(catalog.full_catalog(new_version)), 2)
+
+
+class CatalogEndpointTests(TestCase):
+    url = "/api/medications/drugs/with-variants/"
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(email="paciente@vitalis.local", password="x"))
+        self.amoxicilina = Drug.objects.create(name="amoxicilina")
+
+    def test_etag_returns_304_until_the_catalog_changes(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        etag = response["ETag"]
+        self.assertEqual(response["X-Catalog-Version"], str(catalog.current().version))
+
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        DrugVariant.objects.create(drug=self.amoxicilina, variant_name="500 mg", dosage="500 mg")
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_last_modified_changes_with_every_version(self):
+        last_modified = self.client.get(self.url)["Last-Modified"]
+        self.assertEqual(self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+
+        # Varios cambios dentro del mismo segundo
+        for name in ("paracetamol", "ibuprofeno"):
+            Drug.objects.create(name=name)
+            response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=last_modified)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.json()), Drug.objects.count())
+            last_modified = response["Last-Modified"]
+
+    def test_delta_since_a_version(self):
+        version = catalog.current().version
+        paracetamol = Drug.objects.create(name="paracetamol")
+        deleted_id = self.amoxicilina.pk
+        self.amoxicilina.delete()
+
+        response = self.client.get(self.url, {"since": version})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data["version"], catalog.current().version)
+        self.assertEqual([drug["id"] for drug in data["changed"]], [paracetamol.pk])
+        self.assertEqual(data["deleted"], [deleted_id])
+
+        current = self.client.get(self.url, {"since": data["version"]}).json()
+        self.assertEqual((current["changed"], current["deleted"]), ([], []))
+        self.assertEqual(self.client.get(self.url, {"since": "ayer"}).status_code, 400)
+
+
+class DrugSearchTests(TestCase):
+    url = "/api/medications/drugs/search/"
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(email="paciente@vitalis.local", password="x"))
+        for name in ("Paracetamol", "Parafina", "Aspirina", "Ibuprofeno", "Omeprazol"):
+            Drug.objects.create(name=name)
+        aspirina = Drug.objects.get(name="Aspirina")
+        DrugVariant.objects.create(drug=aspirina, variant_name="Infantil para niños", dosage="100 mg")
+        ibuprofeno = Drug.objects.get(name="Ibuprofeno")
+        DrugVariant.objects.create(drug=ibuprofeno, variant_name="400 mg", dosage="400 mg", manufacturer="Paraquímica")
+
+    def search(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return [drug["name"] for drug in response.json()]
+
+    def test_prefix_matches_rank_first(self):
+        # Prefijo en el nombre, luego coincidencias por variante o fabricante; cada grupo por nombre
+        self.assertEqual(self.search(q="para"), ["Paracetamol", "Parafina", "Aspirina", "Ibuprofeno"])
+        self.assertEqual(self.search(q="prazol"), ["Omeprazol"])
+        self.assertEqual(self.search(q="zzz"), [])
+
+    def test_variants_are_included(self):
+        response = self.client.get(self.url, {"q": "aspirina"})
+        self.assertEqual([v["variant_name"] for v in response.json()[0]["variants"]], ["Infantil para niños"])
+
+    @override_settings(DRUG_SEARCH_MAX_RESULTS=3)
+    def test_limit_is_capped(self):
+        self.assertEqual(self.search(q="para", limit=1), ["Paracetamol"])
+        self.assertEqual(len(self.search(q="para", limit=50)), 3)
+        self.assertEqual(len(self.search(q="para")), 3)
+
+    def test_short_or_invalid_parameters(self):
+        for params in ({}, {"q": ""}, {"q": "   "}, {"q": "p"}, {"q": "para", "limit": "muchos"}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get(self.url, params).status_code, 400)
@@ -8,7 +8,11 @@ from utils.permissions import IsAdminOrReadOnly, IsDoctor
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework.exceptions import PermissionDenied
+from rest_framework.exceptions import PermissionDenied, ValidationError
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from . import catalog
+from .search import search_drugs
 from .validators import *
 from users.models import User
 
@@ -19,13 +23,59 @@ class DrugViewSet(viewsets.ModelViewSet):
     queryset = Drug.objects.all()
     serializer_class = DrugSerializer
     permission_classes = [IsAdminOrReadOnly]
+    cursor_ordering = ("name",)
     @action(detail=False, methods=["get"], url_path="with-variants")
     def list_with_variants(self, request):
         """
         Retorna todos los medicamentos junto con sus variantes.
+
+        El catálogo serializado se guarda en cache por versión. La respuesta
+        lleva ETag/Last-Modified (304 si el cliente ya tiene esa versión; si
+        manda If-None-Match, If-Modified-Since se ignora) y X-Catalog-Version. Con ?since=<versión> devuelve solo lo que cambió:
+        {"version": ..., "changed": [...], "deleted": [ids]}.
+        """
+        current = catalog.current()
+        etag = f'"catalog-{current.version}"'
+        last_modified = int(current.updated_at.timestamp())
+
+        not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if not_modified is not None:
+            return not_modified
+
+        since = request.query_params.get("since")
+        if since is None:
+            response = Response(catalog.full_catalog(current.version), status=status.HTTP_200_OK)
+        else:
+            try:
+                since = int(since)
+            except ValueError:
+                raise ValidationError({"since": "Debe ser un número de versión del catálogo."})
+            response = Response(
+                {"version": current.version, **catalog.changes_since(since)},
+                status=status.HTTP_200_OK,
+            )
+
+        response["ETag"] = etag
+        response["Last-Modified"] = http_date(last_modified)
+        response["X-Catalog-Version"] = current.version
+        return response
+
+    @action(detail=False, methods=["get"], url_path="search")
+    def search(self, request):
         """
-        drugs = Drug.objects.prefetch_related("variants").all()
-        serializer = DrugWithVariantsSerializer(drugs, many=True)
+        Autocompletado del catálogo: ?q=<texto>&limit=<n>.
+        Busca en nombre, variante y fabricante; devuelve los medicamentos
+        con sus variantes, ordenados por relevancia y sin paginar (con tope).
+        """
+        query = request.query_params.get("q", "").strip()
+        if len(query) < 2:
+            raise ValidationError({"q": "Escribe al menos 2 caracteres."})
+        try:
+            limit = int(request.query_params.get("limit", 0))
+        except ValueError:
+            raise ValidationError({"limit": "Debe ser un número."})
+
+        serializer = DrugWithVariantsSerializer(search_drugs(query, limit), many=True)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 class DrugVariantViewSet(viewsets.ModelViewSet):
@@ -38,29 +88,34 @@ class DiagnosisViewSet(viewsets.ModelViewSet):
     queryset = Diagnosis.objects.all()
     serializer_class = DiagnosisSerializer
     permission_classes = [IsDoctor]
+    cursor_ordering = ("-created_at", "-id")
     #Endpoint para que el paciente vea sus diagnósticos
     @action(detail=False, methods=["get"], permission_classes=[permissions.IsAuthenticated])
     def my_diagnoses(self, request):
         user = request.user
-        diagnoses = Diagnosis.objects.filter(patient=user).order_by("-created_at")
-        serializer = self.get_serializer(diagnoses, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        diagnoses = Diagnosis.objects.filter(patient=user)
+        page = self.paginate_queryset(diagnoses)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
 
 class DoctorMedicationViewSet(viewsets.ModelViewSet):
     queryset = Medication.objects.filter(created_by_patient=False)
     serializer_class = MedicationSerializer
     permission_classes = [IsDoctor]
+    cursor_ordering = ("-created_at", "-id")
 
     @action(detail=False, methods=["get"], permission_classes=[permissions.IsAuthenticated])
     def my_medications(self, request):
         user = request.user
-        meds = Medication.objects.filter(patient=user).order_by("-created_at")
-        serializer = self.get_serializer(meds, many=True)
-        return Response(serializer.data)
+        meds = Medication.objects.filter(patient=user)
+        page = self.paginate_queryset(meds)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
     
 class PatientMedicationViewSet(viewsets.ModelViewSet):
     serializer_class = MedicationSerializer
     permission_classes = [permissions.IsAuthenticated]
+    cursor_ordering = ("-created_at", "-id")
 
     def get_queryset(self):
         return Medication.objects.filter(
@@ -78,6 +133,7 @@ class PatientUnsafeMedicationViewSet(viewsets.ModelViewSet):
     """
     serializer_class = UnsafeMedicationSerializer
     permission_classes = [permissions.IsAuthenticated]
+    cursor_ordering = ("-created_at", "-id")
 
     def get_queryset(self):
         return UnsafeMedication.objects.filter(patient=self.request.user).order_by("-created_at")
@@ -93,6 +149,7 @@ class DoctorUnsafeMedicationViewSet(viewsets.ModelViewSet):
     """
     serializer_class = UnsafeMedicationSerializer
     permission_classes = [permissions.IsAuthenticated]
+    cursor_ordering = ("-created_at", "-id")
 
     def get_queryset(self):
         """
@@ -120,8 +177,9 @@ class DoctorUnsafeMedicationViewSet(viewsets.ModelViewSet):
         validate_doctor_patient_access(request.user, patient)
 
         meds = UnsafeMedication.objects.filter(patient=patient).select_related("drug")
-        serializer = self.get_serializer(meds, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        page = self.paginate_queryset(meds)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
 
     def create(self, request, *args, **kwargs):
         """
@@ -0,0 +1,175 @@
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.db import models
+from django.utils import timezone
+from django.db.models.functions import ExtractHour, TruncDate
+
+from .models import DailyAdherence, ReminderLog
+
+
+def _rate(taken, missed):
+    total = taken + missed
+    return round(taken / total, 4) if total else None
+
+
+def _streaks(days, end):
+    """
+    Racha actual (terminando en el último día con registros, si llega hasta
+    `end` o el día anterior) y racha más larga de días consecutivos en los
+    que todas las tomas registradas se marcaron como tomadas.
+    """
+    longest = current = 0
+    previous = None
+    for day in sorted(days):
+        taken, missed = days[day]
+        if missed or not taken:
+            current = 0
+        elif previous is not None and day - previous == timedelta(days=1) and current:
+            current += 1
+        else:
+            current = 1
+        longest = max(longest, current)
+        previous = day
+    if previous is None or end - previous > timedelta(days=1):
+        current = 0
+    return current, longest
+
+
+def adherence_summary(patient_id, start, end):
+    """
+    Resumen de adherencia de un paciente entre `start` y `end` (fechas,
+    inclusive): totales, por medicamento, por recordatorio (con rachas) y
+    por hora del día.
+
+    La base de datos agrupa los logs por (recordatorio, día, hora) en una
+    sola query; aquí solo se combinan esos grupos, que son muchos menos que
+    los logs cuando hay varias tomas por hora o días sin registros.
+    """
+    # Rango por datetime (no __date) para que use el índice (reminder, taken_at)
+    since = timezone.make_aware(datetime.combine(start, time.min))
+    until = timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min))
+    rows = (
+        ReminderLog.objects.filter(
+            reminder__patient_id=patient_id,
+            taken_at__gte=since,
+            taken_at__lt=until,
+        )
+        .annotate(day=TruncDate("taken_at"), hour=ExtractHour("taken_at"))
+        .values(
+            "reminder_id",
+            "reminder__title",
+            "reminder__medication_id",
+            "reminder__medication__drug_variant__drug__name",
+            "reminder__medication__drug_variant__variant_name",
+            "day",
+            "hour",
+        )
+        .annotate(
+            taken=models.Count("id", filter=models.Q(was_taken=True)),
+            missed=models.Count("id", filter=models.Q(was_taken=False)),
+        )
+        .order_by()
+    )
+
+    reminders = {}
+    medications = {}
+    reminder_days = defaultdict(lambda: defaultdict(lambda: [0, 0]))
+    patient_days = defaultdict(lambda: [0, 0])
+    hours = defaultdict(lambda: [0, 0])
+
+    for row in rows:
+        taken, missed = row["taken"], row["missed"]
+
+        reminder = reminders.setdefault(
+            row["reminder_id"],
+            {
+                "reminder": row["reminder_id"],
+                "title": row["reminder__title"],
+                "medication": row["reminder__medication_id"],
+                "taken": 0,
+                "missed": 0,
+            },
+        )
+        reminder["taken"] += taken
+        reminder["missed"] += missed
+
+        medication = medications.setdefault(
+            row["reminder__medication_id"],
+            {
+                "medication": row["reminder__medication_id"],
+                "drug": row["reminder__medication__drug_variant__drug__name"],
+                "variant": row["reminder__medication__drug_variant__variant_name"],
+                "taken": 0,
+                "missed": 0,
+            },
+        )
+        medication["taken"] += taken
+        medication["missed"] += missed
+
+        for counts in (reminder_days[row["reminder_id"]][row["day"]], patient_days[row["day"]], hours[row["hour"]]):
+            counts[0] += taken
+            counts[1] += missed
+
+    for reminder_id, reminder in reminders.items():
+        reminder["rate"] = _rate(reminder["taken"], reminder["missed"])
+        reminder["current_streak"], reminder["longest_streak"] = _streaks(reminder_days[reminder_id], end)
+    for medication in medications.values():
+        medication["rate"] = _rate(medication["taken"], medication["missed"])
+
+    taken = sum(r["taken"] for r in reminders.values())
+    missed = sum(r["missed"] for r in reminders.values())
+    current_streak, longest_streak = _streaks(patient_days, end)
+
+    return {
+        "patient": int(patient_id),
+        "from": start,
+        "to": end,
+        "overall": {
+            "taken": taken,
+            "missed": missed,
+            "rate": _rate(taken, missed),
+            "current_streak": current_streak,
+            "longest_streak": longest_streak,
+        },
+        "by_medication": sorted(medications.values(), key=lambda m: m["medication"]),
+        "by_reminder": sorted(reminders.values(), key=lambda r: r["reminder"]),
+        "by_hour": [
+            {"hour": hour, "taken": counts[0], "missed": counts[1]}
+            for hour, counts in sorted(hours.items())
+        ],
+    }
+
+
+def daily_adherence(patient_id, start, end):
+    """
+    Serie diaria de adherencia del paciente leída de DailyAdherence: una
+    fila agregada por día, sin recorrer los logs, más totales y rachas.
+    """
+    rows = (
+        DailyAdherence.objects.filter(patient_id=patient_id, day__gte=start, day__lte=end)
+        .values("day")
+        .annotate(taken=models.Sum("taken"), missed=models.Sum("missed"))
+        .order_by("day")
+    )
+    days = {row["day"]: [row["taken"], row["missed"]] for row in rows}
+    taken = sum(counts[0] for counts in days.values())
+    missed = sum(counts[1] for counts in days.values())
+    current_streak, longest_streak = _streaks(days, end)
+
+    return {
+        "patient": int(patient_id),
+        "from": start,
+        "to": end,
+        "overall": {
+            "taken": taken,
+            "missed": missed,
+            "rate": _rate(taken, missed),
+            "current_streak": current_streak,
+            "longest_streak": longest_streak,
+        },
+        "days": [
+            {"day": day, "taken": counts[0], "missed": counts[1], "rate": _rate(*counts)}
+            for day, counts in days.items()
+        ],
+    }
@@ -3,4 +3,8 @@ from .models import *
 # Register your models here.
 admin.site.register(ReminderAccess)
 
-admin.site.register(Reminder)
\ No newline at end of file
+admin.site.register(Reminder)
+
+admin.site.register(NotificationOutbox)
+
+admin.site.register(DailyAdherence)
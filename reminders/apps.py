@@ -1,6 +1,4 @@
 from django.apps import AppConfig
-import os
-import threading
 
 
 class RemindersConfig(AppConfig):
@@ -8,19 +6,8 @@ class RemindersConfig(AppConfig):
     name = 'reminders'
     def ready(self):
         """
-        Inicia el scheduler solo cuando Django arranca.
-        Evita ejecución múltiple en auto-reload o workers adicionales.
+        Registra las señales de recordatorios.
+        El scheduler ya no corre dentro de los procesos web: se inicia en un
+        proceso aparte con `manage.py run_reminder_worker`.
         """
-
-        # Evitar ejecución en threads secundarios
-        if threading.current_thread().name != "MainThread":
-            return
-
-        # Evitar ejecución en migraciones
-        if os.environ.get("RUN_MAIN") != "true":
-            return
-
-        from .scheduler import start_reminder_scheduler
-
-        print("[Reminders] Inicializando scheduler de recordatorios...")
-        start_reminder_scheduler()
\ No newline at end of file
+        import reminders.signals
@@ -0,0 +1,144 @@
+import asyncio
+import threading
+
+import firebase_admin
+import httpx
+from django.conf import settings
+from firebase_admin import _utils, messaging
+from google.auth.transport.requests import Request as GoogleAuthRequest
+
+
+class AsyncFCMDispatcher:
+    """
+    Motor de envío asíncrono contra la API v1 de FCM.
+
+    Mantiene un único cliente httpx con HTTP/2 y pool de conexiones en un
+    event loop propio (hilo de fondo), envía muchos mensajes en paralelo
+    acotados por un semáforo compartido por todas las llamadas (el límite
+    es global aunque varios dispatchers del outbox lo usen) y refresca el token OAuth una sola vez para
+    todo el pool en lugar de por petición.
+
+    base_url, credential y transport (p. ej. httpx.MockTransport) se pueden
+    reemplazar para probarlo contra un servidor HTTP local.
+    """
+
+    FCM_PATH = "/v1/projects/{project_id}/messages:send"
+
+    def __init__(self, project_id=None, credential=None, base_url=None, concurrency=None, timeout=10, transport=None):
+        app = None
+        if project_id is None or credential is None:
+            app = firebase_admin.get_app()
+        self.project_id = project_id or app.project_id
+        self.credential = credential or app.credential.get_credential()
+        self.url = (base_url or settings.REMINDERS_FCM_BASE_URL).rstrip("/") + self.FCM_PATH.format(
+            project_id=self.project_id
+        )
+        self.concurrency = concurrency or settings.REMINDERS_PUSH_CONCURRENCY
+        self.timeout = timeout
+        self.transport = transport
+
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="fcm-async", daemon=True)
+        self._thread.start()
+        self._client = None
+        self._token_lock = None
+        self._semaphore = None
+
+    # -------------------------------
+    # API síncrona (usada por el scheduler)
+    # -------------------------------
+    def send_each(self, messages, dry_run=False):
+        """Envía los mensajes y devuelve un SendResponse por mensaje, en el mismo orden."""
+        future = asyncio.run_coroutine_threadsafe(self.send_each_async(messages, dry_run), self._loop)
+        return future.result()
+
+    def close(self):
+        if self._client:
+            asyncio.run_coroutine_threadsafe(self._client.aclose(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+    # -------------------------------
+    # Implementación asíncrona
+    # -------------------------------
+    async def send_each_async(self, messages, dry_run=False):
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                http2=True,
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.concurrency,
+                    max_keepalive_connections=self.concurrency,
+                ),
+                transport=self.transport,
+            )
+            self._token_lock = asyncio.Lock()
+            # Uno por dispatcher: acota las peticiones en vuelo de todos los
+            # hilos que comparten este loop, no las de cada llamada
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def send(message):
+            async with self._semaphore:
+                return await self._send(message, dry_run)
+
+        return await asyncio.gather(*(send(message) for message in messages))
+
+    async def _send(self, message, dry_run):
+        body = {"message": messaging._MessagingService.encode_message(message)}
+        if dry_run:
+            body["validate_only"] = True
+
+        try:
+            token = await self._access_token()
+            response = await self._post(body, token)
+            if response.status_code == 401:
+                # Token revocado o expirado antes de tiempo: se refresca y se reintenta
+                token = await self._access_token(stale_token=token)
+                response = await self._post(body, token)
+            response.raise_for_status()
+        except httpx.HTTPError as error:
+            return messaging.SendResponse(None, self._handle_error(error))
+
+        return messaging.SendResponse(response.json(), None)
+
+    async def _post(self, body, token):
+        return await self._client.post(
+            self.url,
+            json=body,
+            headers={
+                "Authorization": f"Bearer {token}",
+                "X-GOOG-API-FORMAT-VERSION": "2",
+            },
+        )
+
+    async def _access_token(self, stale_token=None):
+        """
+        Token OAuth compartido por todas las peticiones; se refresca solo al expirar
+        o cuando FCM rechaza stale_token (una sola vez aunque fallen muchas peticiones).
+        """
+        async with self._token_lock:
+            if not self.credential.valid or (stale_token and self.credential.token == stale_token):
+                await asyncio.get_running_loop().run_in_executor(
+                    None, self.credential.refresh, GoogleAuthRequest()
+                )
+            return self.credential.token
+
+    @staticmethod
+    def _handle_error(error):
+        # Mismo mapeo de errores que firebase_admin (UnregisteredError, etc.)
+        return _utils.handle_platform_error_from_httpx(
+            error, messaging._MessagingService._build_fcm_error_httpx
+        )
+
+
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_async_dispatcher():
+    """Dispatcher compartido por el proceso (un solo pool HTTP/2)."""
+    global _dispatcher
+
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            _dispatcher = AsyncFCMDispatcher()
+        return _dispatcher
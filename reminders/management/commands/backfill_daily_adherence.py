@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from reminders import rollup
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconstruye el resumen DailyAdherence a partir de ReminderLog, por bloques de "
+        "recordatorios y una transacción por bloque. Se puede volver a ejecutar sin riesgo."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=500, help="Recordatorios por transacción")
+
+    def handle(self, *args, **options):
+        reminders = rows = 0
+        for chunk_reminders, chunk_rows in rollup.backfill(chunk_size=options["chunk_size"]):
+            reminders += chunk_reminders
+            rows += chunk_rows
+            self.stdout.write(f"{reminders} recordatorios procesados, {rows} días resumidos")
+        self.stdout.write(self.style.SUCCESS(f"DailyAdherence reconstruido: {rows} filas."))
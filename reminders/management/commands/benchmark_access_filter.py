@@ -0,0 +1,140 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import models, transaction
+from django.utils import timezone
+
+from medications.models import Drug, DrugVariant, Medication
+from reminders.models import Reminder, ReminderAccess, ReminderLog
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara el filtro de acceso anterior (OR + JOIN + distinct()) con visible_to() "
+        "sobre un dataset grande de recordatorios. Los datos se crean dentro de una "
+        "transacción que se revierte al terminar."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=200_000, help="Recordatorios a generar")
+        parser.add_argument("--patients", type=int, default=2_000, help="Pacientes entre los que se reparten")
+        parser.add_argument("--repeat", type=int, default=5, help="Repeticiones por consulta (se toma la mejor)")
+        parser.add_argument("--page-size", type=int, default=50, help="Tamaño de la primera página")
+
+    def handle(self, *args, **options):
+        repeat = options["repeat"]
+        page_size = options["page_size"]
+
+        with transaction.atomic():
+            user = self._seed(options["rows"], options["patients"])
+
+            results = []
+            for name, legacy, current, ordering in self._queries(user):
+                legacy_ids = list(legacy.values_list("pk", flat=True))
+                current_ids = list(current.values_list("pk", flat=True))
+                if sorted(legacy_ids) != sorted(current_ids):
+                    raise CommandError(f"{name}: las dos formas devuelven filas distintas")
+
+                for label, queryset in (("anterior", legacy), ("actual", current)):
+                    full = self._best_of(repeat, lambda: list(queryset.values_list("pk", flat=True)))
+                    page = self._best_of(repeat, lambda: list(queryset.order_by(*ordering)[:page_size]))
+                    results.append((name, label, len(current_ids), full, page))
+
+            transaction.set_rollback(True)
+
+        for name, label, rows, full, page in results:
+            self.stdout.write(
+                f"{name:<12} {label:<9} {rows:>7} filas  completo {full * 1000:8.1f} ms  "
+                f"primera página {page * 1000:8.1f} ms"
+            )
+
+    def _queries(self, user):
+        yield (
+            "reminders",
+            Reminder.objects.filter(models.Q(patient=user) | models.Q(shared_with__user=user)).distinct(),
+            Reminder.objects.visible_to(user),
+            ("-created_at", "-id"),
+        )
+        yield (
+            "logs",
+            ReminderLog.objects.filter(
+                models.Q(reminder__patient=user) | models.Q(reminder__shared_with__user=user)
+            ).distinct(),
+            ReminderLog.objects.visible_to(user),
+            ("-taken_at", "-id"),
+        )
+        yield (
+            "accesos",
+            ReminderAccess.objects.filter(
+                models.Q(reminder__patient=user) | models.Q(reminder__created_by=user)
+            ).distinct(),
+            ReminderAccess.objects.managed_by(user),
+            ("-added_at", "-id"),
+        )
+
+    def _best_of(self, repeat, func):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best
+
+    def _seed(self, rows, patients):
+        now = timezone.now()
+        users = User.objects.bulk_create(
+            [User(email=f"benchmark-access-{i}@vitalis.local", password="!") for i in range(patients)],
+            batch_size=5000,
+        )
+        user = users[0]
+
+        drug = Drug.objects.create(name="benchmark-access-drug")
+        variant = DrugVariant.objects.create(drug=drug, variant_name="benchmark", dosage="1")
+        medication = Medication.objects.create(
+            patient=user,
+            drug_variant=variant,
+            dosage_instructions="benchmark",
+            start_date=now.date(),
+            end_date=now.date(),
+        )
+
+        # El usuario medido es paciente de ~1/patients de los recordatorios y cuidador
+        # de otros cuantos; el resto pertenece a otros pacientes.
+        reminders = Reminder.objects.bulk_create(
+            [
+                Reminder(
+                    patient=users[i % patients],
+                    created_by=users[(i + 1) % patients] if i % 10 == 0 else users[i % patients],
+                    medication=medication,
+                    title="benchmark-access",
+                    start_time=now,
+                    frequency="daily",
+                    interval_hours=24,
+                    next_trigger_time=now + timezone.timedelta(minutes=i),
+                )
+                for i in range(rows)
+            ],
+            batch_size=5000,
+        )
+        ReminderAccess.objects.bulk_create(
+            [
+                ReminderAccess(reminder=reminder, user=users[(i * 7 + 3) % patients])
+                for i, reminder in enumerate(reminders)
+                if i % 5 == 0
+            ]
+            + [
+                # Varios accesos sobre recordatorios propios para que el JOIN duplique filas
+                ReminderAccess(reminder=reminder, user=users[1 + i % (patients - 1)])
+                for i, reminder in enumerate(reminders)
+                if i % patients == 0
+            ],
+            batch_size=5000,
+            ignore_conflicts=True,
+        )
+        ReminderLog.objects.bulk_create(
+            [ReminderLog(reminder=reminder, was_taken=i % 3 != 0) for i, reminder in enumerate(reminders)],
+            batch_size=5000,
+        )
+        return user
@@ -0,0 +1,91 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from medications.models import Drug, DrugVariant, Medication
+from reminders.models import Reminder, NotificationOutbox
+from reminders.scheduler import process_reminders
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide cuánto tarda un tick de process_reminders en encolar N recordatorios vencidos, "
+        "reclamados en lotes de --batch-size. "
+        "Los datos se crean dentro de una transacción que se revierte al terminar."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--count", type=int, default=10000, help="Recordatorios vencidos a generar")
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=settings.REMINDERS_BATCH_SIZE,
+            help="Lote reclamado por tick (por defecto, REMINDERS_BATCH_SIZE como en el worker)",
+        )
+        parser.add_argument("--budget", type=float, default=5.0, help="Tiempo máximo permitido por tick, en segundos")
+
+    def handle(self, *args, **options):
+        count = options["count"]
+        batch_size = options["batch_size"]
+        budget = options["budget"]
+
+        with transaction.atomic():
+            self._seed(count)
+
+            start = time.perf_counter()
+            # El tick reclama lotes hasta vaciar la cola o agotar el presupuesto
+            process_reminders(worker_id="benchmark", batch_size=batch_size, budget=budget)
+            elapsed = time.perf_counter() - start
+
+            enqueued = NotificationOutbox.objects.filter(reminder__title__startswith="benchmark-").count()
+            remaining = Reminder.objects.filter(
+                title__startswith="benchmark-", is_active=True, next_trigger_time__lte=timezone.now()
+            ).count()
+            transaction.set_rollback(True)
+
+        self.stdout.write(
+            f"{count} recordatorios vencidos, lote de {batch_size}: {enqueued} encolados en {elapsed:.3f}s "
+            f"({(count - remaining) / elapsed:.0f} recordatorios/s)"
+        )
+        if remaining:
+            self.stderr.write(self.style.ERROR(f"{remaining} recordatorios siguen vencidos tras el tick de {budget}s"))
+            raise SystemExit(1)
+        if elapsed > budget:
+            self.stderr.write(self.style.ERROR(f"El tick excedió el intervalo de {budget}s"))
+            raise SystemExit(1)
+        self.stdout.write(self.style.SUCCESS(f"El tick terminó dentro del intervalo de {budget}s"))
+
+    def _seed(self, count):
+        now = timezone.now()
+        patient = User.objects.create_user(email="benchmark-scheduler@vitalis.local", password=None)
+        drug = Drug.objects.create(name="benchmark-scheduler-drug")
+        variant = DrugVariant.objects.create(drug=drug, variant_name="benchmark", dosage="1")
+        medication = Medication.objects.create(
+            patient=patient,
+            drug_variant=variant,
+            dosage_instructions="benchmark",
+            start_date=now.date(),
+            end_date=(now + timezone.timedelta(days=30)).date(),
+        )
+
+        frequencies = ["daily", "weekly", "custom", "once"]
+        Reminder.objects.bulk_create(
+            [
+                Reminder(
+                    patient=patient,
+                    created_by=patient,
+                    medication=medication,
+                    title=f"benchmark-{i}",
+                    start_time=now - timezone.timedelta(days=1),
+                    frequency=frequencies[i % len(frequencies)],
+                    interval_hours=8,
+                    next_trigger_time=now - timezone.timedelta(seconds=i % 60),
+                )
+                for i in range(count)
+            ],
+            batch_size=1000,
+        )
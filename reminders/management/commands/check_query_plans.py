@@ -0,0 +1,140 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, models, transaction
+from django.utils import timezone
+
+from medications.models import Drug, DrugVariant, Medication
+from reminders.models import Reminder, ReminderAccess, ReminderLog
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Genera un dataset grande de recordatorios y ejecuta EXPLAIN sobre las consultas "
+        "del scheduler y de los listados. Falla si alguna cae en un Seq Scan. "
+        "Solo PostgreSQL; los datos se revierten al terminar."
+    )
+
+    CHECKED_TABLES = {
+        Reminder._meta.db_table,
+        ReminderAccess._meta.db_table,
+        ReminderLog._meta.db_table,
+    }
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=1_000_000, help="Recordatorios a generar")
+        parser.add_argument("--patients", type=int, default=50_000, help="Pacientes entre los que se reparten")
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError("check_query_plans requiere PostgreSQL.")
+
+        with transaction.atomic():
+            patient, doctor = self._seed(options["rows"], options["patients"])
+
+            failures = []
+            for name, queryset in self._queries(patient, doctor):
+                plan = json.loads(queryset.explain(format="json"))[0]["Plan"]
+                seq_scans = [
+                    node["Relation Name"]
+                    for node in self._walk(plan)
+                    if node["Node Type"] == "Seq Scan" and node.get("Relation Name") in self.CHECKED_TABLES
+                ]
+                if seq_scans:
+                    failures.append(name)
+                    self.stdout.write(self.style.ERROR(f"[FAIL] {name}: Seq Scan en {', '.join(seq_scans)}"))
+                else:
+                    self.stdout.write(self.style.SUCCESS(f"[OK]   {name}"))
+
+            transaction.set_rollback(True)
+
+        if failures:
+            raise CommandError(f"{len(failures)} consultas sin índice: {', '.join(failures)}")
+
+    def _queries(self, patient, doctor):
+        now = timezone.now()
+        yield "scheduler: claim de reminders vencidos", (
+            Reminder.objects.filter(is_active=True, next_trigger_time__lte=now)
+            .filter(models.Q(lease_expires_at__isnull=True) | models.Q(lease_expires_at__lt=now))
+            .order_by("next_trigger_time")
+            .values_list("id", flat=True)[:500]
+        )
+        yield "scheduler: ventana del timer", (
+            Reminder.objects.filter(
+                is_active=True, next_trigger_time__lte=now + timezone.timedelta(seconds=60)
+            ).values_list("id", "next_trigger_time")
+        )
+        yield "paciente: listado de recordatorios", Reminder.objects.visible_to(patient)
+        yield "doctor: listado de recordatorios", Reminder.objects.filter(created_by=doctor)
+        yield "paciente: logs", ReminderLog.objects.visible_to(patient)
+        yield "doctor: logs de un paciente", ReminderLog.objects.filter(reminder__patient_id=patient.id)
+        yield "acceso: recordatorios compartidos", ReminderAccess.objects.managed_by(patient)
+
+    def _walk(self, node):
+        yield node
+        for child in node.get("Plans", []):
+            yield from self._walk(child)
+
+    def _seed(self, rows, patients):
+        now = timezone.now()
+        users = User.objects.bulk_create(
+            [User(email=f"plan-check-{i}@vitalis.local", password="!") for i in range(patients)],
+            batch_size=5000,
+        )
+        user_ids = [user.id for user in users]
+        doctor = users[-1]
+
+        drug = Drug.objects.create(name="plan-check-drug")
+        variant = DrugVariant.objects.create(drug=drug, variant_name="plan-check", dosage="1")
+        medication = Medication.objects.create(
+            patient=users[0],
+            drug_variant=variant,
+            dosage_instructions="plan-check",
+            start_date=now.date(),
+            end_date=now.date(),
+        )
+
+        reminder_table = Reminder._meta.db_table
+        with connection.cursor() as cursor:
+            # Unos pocos vencidos, la mayoría repartidos en el próximo año
+            cursor.execute(
+                f"""
+                INSERT INTO {reminder_table} (
+                    patient_id, created_by_id, medication_id, title, message, start_time,
+                    frequency, interval_hours, is_active, created_at, updated_at, next_trigger_time
+                )
+                SELECT
+                    ids[1 + g %% cardinality(ids)],
+                    CASE WHEN g %% 10 = 0 THEN %s ELSE ids[1 + g %% cardinality(ids)] END,
+                    %s, 'plan-check', '', %s, 'daily', 24, g %% 20 <> 0,
+                    %s - make_interval(mins => g),
+                    %s - make_interval(mins => g),
+                    CASE WHEN g %% 1000 = 0 THEN %s - interval '1 minute'
+                         ELSE %s + make_interval(mins => g %% 525600) END
+                FROM generate_series(1, %s) AS g, (SELECT %s::bigint[] AS ids) AS u
+                """,
+                [doctor.id, medication.id, now, now, now, now, now, rows, user_ids],
+            )
+            cursor.execute(
+                f"""
+                INSERT INTO {ReminderAccess._meta.db_table} (
+                    reminder_id, user_id, can_edit, can_delete, receive_notifications, added_at
+                )
+                SELECT r.id, ids[1 + (r.id + 1) %% cardinality(ids)], false, false, true, r.created_at
+                FROM {reminder_table} AS r, (SELECT %s::bigint[] AS ids) AS u
+                WHERE r.id %% 10 = 0 AND r.title = 'plan-check'
+                """,
+                [user_ids],
+            )
+            cursor.execute(
+                f"""
+                INSERT INTO {ReminderLog._meta.db_table} (reminder_id, taken_at, was_taken, updated_at)
+                SELECT id, created_at, id %% 3 <> 0, created_at FROM {reminder_table} WHERE title = 'plan-check'
+                """,
+                [],
+            )
+            for table in self.CHECKED_TABLES:
+                cursor.execute(f"ANALYZE {table}")
+
+        return users[0], doctor
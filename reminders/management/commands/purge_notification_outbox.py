@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from reminders.scheduler import purge_outbox
+
+
+class Command(BaseCommand):
+    help = (
+        "Borra del outbox las notificaciones enviadas o fallidas más viejas que "
+        "REMINDERS_OUTBOX_RETENTION_DAYS, en lotes cortos. Las pendientes no se tocan."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=settings.REMINDERS_OUTBOX_PURGE_BATCH_SIZE,
+            help="Filas borradas por transacción",
+        )
+        parser.add_argument("--pause", type=float, default=0, help="Segundos de espera entre lotes")
+
+    def handle(self, *args, **options):
+        deleted = purge_outbox(batch_size=options["batch_size"], pause=options["pause"])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{deleted} notificaciones borradas del outbox "
+                f"(retención: {settings.REMINDERS_OUTBOX_RETENTION_DAYS} días)."
+            )
+        )
@@ -0,0 +1,19 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from reminders.sync import purge_tombstones
+
+
+class Command(BaseCommand):
+    help = (
+        "Borra los tombstones de sincronización más viejos que SYNC_TOMBSTONE_RETENTION_DAYS. "
+        "Los clientes con un token anterior reciben una sincronización completa."
+    )
+
+    def handle(self, *args, **options):
+        deleted = purge_tombstones()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{deleted} tombstones borrados (retención: {settings.SYNC_TOMBSTONE_RETENTION_DAYS} días)."
+            )
+        )
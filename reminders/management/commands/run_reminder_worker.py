@@ -0,0 +1,71 @@
+import signal
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from reminders.scheduler import get_worker_id, start_reminder_scheduler, stop_reminder_scheduler
+from reminders.timer import supports_notify
+
+
+class Command(BaseCommand):
+    help = (
+        "Inicia el worker dedicado de recordatorios: procesa los disparos y drena el "
+        "outbox de notificaciones. Con SIGTERM/SIGINT termina los lotes en curso y sale. "
+        "En modo timer con Postgres escucha (LISTEN) los cambios que hacen los procesos web; "
+        "con otros backends la ventana del timer se limita a 5 segundos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--interval", type=int, default=5, help="Segundos entre ticks (modo interval)")
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=settings.REMINDERS_BATCH_SIZE,
+            help="Recordatorios / notificaciones reclamados por lote",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=settings.REMINDERS_DISPATCH_CONCURRENCY,
+            help="Dispatchers del outbox en paralelo",
+        )
+        parser.add_argument("--shard-id", type=int, default=None, help="Shard que procesa este worker (0..shards-1)")
+        parser.add_argument("--shards", type=int, default=None, help="Total de shards")
+
+    def handle(self, *args, **options):
+        shard = None
+        if options["shard_id"] is not None or options["shards"] is not None:
+            shard_id, shards = options["shard_id"], options["shards"]
+            if shard_id is None or not shards or not 0 <= shard_id < shards:
+                raise CommandError("--shard-id y --shards deben usarse juntos, con 0 <= shard-id < shards.")
+            shard = (shard_id, shards)
+
+        stopping = threading.Event()
+
+        def request_stop(signum, frame):
+            self.stdout.write("[Reminders] Señal recibida, terminando lotes en curso...")
+            stopping.set()
+
+        signal.signal(signal.SIGTERM, request_stop)
+        signal.signal(signal.SIGINT, request_stop)
+
+        self.stdout.write(
+            f"[Reminders] Worker {get_worker_id()} iniciado "
+            f"(modo {settings.REMINDERS_SCHEDULER_MODE}, shard {shard or 'todos'})"
+        )
+        if settings.REMINDERS_SCHEDULER_MODE == "timer" and not supports_notify():
+            self.stdout.write(
+                "[Reminders] Sin LISTEN/NOTIFY en este backend: los cambios hechos por la API "
+                "se ven en el siguiente relleno de la ventana (cada 5 segundos como máximo)."
+            )
+        start_reminder_scheduler(
+            interval=options["interval"],
+            batch_size=options["batch_size"],
+            concurrency=options["concurrency"],
+            shard=shard,
+        )
+
+        stopping.wait()
+        stop_reminder_scheduler()
+        self.stdout.write(self.style.SUCCESS("[Reminders] Worker detenido."))
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-17 16:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reminders', '0003_rename_granted_at_reminderaccess_added_at_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reminder',
+            name='lease_expires_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='reminder',
+            name='lease_owner',
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.6 on 2026-10-17 16:14
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medications', '0004_alter_medication_doctor'),
+        ('reminders', '0005_notificationoutbox'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reminder',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['next_trigger_time'], name='reminder_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reminder',
+            index=models.Index(fields=['patient', '-created_at'], name='reminder_patient_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reminder',
+            index=models.Index(fields=['created_by', '-created_at'], name='reminder_creator_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reminderaccess',
+            index=models.Index(fields=['user', 'reminder'], name='reminderaccess_user_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.6 on 2026-10-17 16:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reminders', '0006_reminder_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reminderlog',
+            index=models.Index(fields=['reminder', '-taken_at', '-id'], name='reminderlog_reminder_taken_idx'),
+        ),
+    ]
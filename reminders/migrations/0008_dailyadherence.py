@@ -0,0 +1,31 @@
+# Generated by Django 5.2.6 on 2026-10-17 17:28
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reminders', '0007_reminderlog_taken_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyAdherence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('taken', models.PositiveIntegerField(default=0)),
+                ('missed', models.PositiveIntegerField(default=0)),
+                ('patient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_adherence', to=settings.AUTH_USER_MODEL)),
+                ('reminder', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_adherence', to='reminders.reminder')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['patient', 'day'], name='dailyadherence_patient_idx')],
+                'unique_together': {('reminder', 'day')},
+            },
+        ),
+    ]
@@ -4,6 +4,57 @@ from django.utils import timezone
 
 User = settings.AUTH_USER_MODEL
 
+
+def visible_reminder_ids(user):
+    """
+    Subconsulta con los ids de recordatorios visibles para el usuario:
+    UNION de los que tiene como paciente y los compartidos con él.
+    Cada rama usa su propio índice (reminder_patient_created_idx y
+    reminderaccess_user_idx) y el UNION ya elimina duplicados, así que no
+    hace falta el LEFT JOIN + distinct() de `patient=user | shared_with__user=user`.
+    """
+    own = Reminder.objects.filter(patient=user).order_by().values("pk")
+    shared = ReminderAccess.objects.filter(user=user).order_by().values("reminder_id")
+    return own.union(shared)
+
+
+class ReminderQuerySet(models.QuerySet):
+    def visible_to(self, user):
+        """
+        Recordatorios que el usuario puede ver: los suyos como paciente y los
+        compartidos con él (ver visible_reminder_ids).
+        """
+        return self.filter(pk__in=visible_reminder_ids(user))
+
+    def with_access_flag(self, user):
+        """
+        Anota `user_has_access` con la misma regla que Reminder.has_access
+        (paciente, creador o ReminderAccess), para validar varios recordatorios
+        en una sola query.
+        """
+        shared = ReminderAccess.objects.filter(reminder=models.OuterRef("pk"), user=user)
+        return self.annotate(
+            user_has_access=models.ExpressionWrapper(
+                models.Q(patient=user) | models.Q(created_by=user) | models.Q(models.Exists(shared)),
+                output_field=models.BooleanField(),
+            )
+        )
+
+    def for_list(self):
+        """
+        Carga todo lo que usa ReminderSerializer en un número fijo de queries:
+        paciente, creador y medicación por JOIN, y los accesos compartidos
+        (con su usuario y roles) en un solo prefetch guardado en `prefetched_access`.
+        """
+        return self.select_related("patient", "created_by", "medication").prefetch_related(
+            models.Prefetch(
+                "shared_with",
+                queryset=ReminderAccess.objects.select_related("user").prefetch_related("user__roles"),
+                to_attr="prefetched_access",
+            )
+        )
+
+
 class Reminder(models.Model):
     FREQUENCY_CHOICES = [
         ("once", "Una vez"),
@@ -21,11 +72,32 @@ class Reminder(models.Model):
     interval_hours = models.PositiveIntegerField(blank=True, null=True)
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name="created_reminders")
     next_trigger_time = models.DateTimeField(blank=True, null=True)
 
+    objects = ReminderQuerySet.as_manager()
+
+    # Lease del worker que reclamó el recordatorio para enviarlo.
+    # Permite que varios procesos compartan la cola sin envíos duplicados.
+    lease_owner = models.CharField(max_length=255, blank=True, null=True)
+    lease_expires_at = models.DateTimeField(blank=True, null=True)
+
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            # Cola de disparos del scheduler: is_active=True AND next_trigger_time <= now
+            models.Index(
+                fields=["next_trigger_time"],
+                condition=models.Q(is_active=True),
+                name="reminder_due_idx",
+            ),
+            # Listados por paciente y por creador (doctor), ordenados por fecha
+            models.Index(fields=["patient", "-created_at"], name="reminder_patient_created_idx"),
+            models.Index(fields=["created_by", "-created_at"], name="reminder_creator_created_idx"),
+            # Cambios desde un token de sincronización (reminders.sync)
+            models.Index(fields=["patient", "updated_at"], name="reminder_patient_updated_idx"),
+        ]
 
     def __str__(self):
         return f"Reminder for {self.patient} - {self.title}"
@@ -45,6 +117,16 @@ class Reminder(models.Model):
             return True
         return self.shared_with.filter(user=user).exists()
 
+    @property
+    def shared_access_list(self):
+        """
+        Accesos compartidos del recordatorio. Usa el prefetch de for_list()
+        si existe; si no, los consulta con su usuario en una sola query.
+        """
+        if hasattr(self, "prefetched_access"):
+            return self.prefetched_access
+        return list(self.shared_with.select_related("user").prefetch_related("user__roles"))
+
     def get_all_receivers(self):
         """
         Devuelve todos los usuarios que deben recibir notificación de este recordatorio:
@@ -58,6 +140,16 @@ class Reminder(models.Model):
         return list(users)  
 
 
+class ReminderAccessQuerySet(models.QuerySet):
+    def managed_by(self, user):
+        """
+        Accesos de recordatorios donde el usuario es paciente o creador.
+        Ambas condiciones pasan por la FK a Reminder (una fila por acceso),
+        así que no necesita distinct().
+        """
+        return self.filter(models.Q(reminder__patient=user) | models.Q(reminder__created_by=user))
+
+
 class ReminderAccess(models.Model):
     """
     Define qué usuarios tienen acceso a un Reminder específico.
@@ -70,19 +162,126 @@ class ReminderAccess(models.Model):
     receive_notifications = models.BooleanField(default=True)
     added_at = models.DateTimeField(auto_now_add=True)
 
+    objects = ReminderAccessQuerySet.as_manager()
+
     class Meta:
         unique_together = ("reminder", "user")
+        indexes = [
+            # Búsqueda de recordatorios compartidos con un usuario (shared_with__user)
+            models.Index(fields=["user", "reminder"], name="reminderaccess_user_idx"),
+        ]
 
     def __str__(self):
         return f"{self.user} tiene acceso a {self.reminder}"
 
 
 
+class NotificationOutbox(models.Model):
+    """
+    Notificación pendiente de enviar para un disparo de un Reminder.
+    El tick del scheduler solo inserta filas aquí; un dispatcher separado
+    las drena y hace las llamadas a FCM fuera de la transacción.
+    """
+    STATUS_CHOICES = [
+        ("pending", "Pendiente"),
+        ("sent", "Enviada"),
+        ("failed", "Fallida"),
+    ]
+
+    reminder = models.ForeignKey(Reminder, on_delete=models.CASCADE, related_name="outbox")
+    scheduled_for = models.DateTimeField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="pending")
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    available_at = models.DateTimeField(default=timezone.now)
+    lease_owner = models.CharField(max_length=255, blank=True, null=True)
+    lease_expires_at = models.DateTimeField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        unique_together = ("reminder", "scheduled_for")  # un envío por disparo
+        indexes = [
+            models.Index(fields=["status", "available_at"]),
+        ]
+
+    def __str__(self):
+        return f"Outbox {self.reminder_id} @ {self.scheduled_for} ({self.status})"
+
+
+class ReminderLogQuerySet(models.QuerySet):
+    def visible_to(self, user):
+        """
+        Logs de los recordatorios que el usuario puede ver (ver visible_reminder_ids).
+        """
+        return self.filter(reminder_id__in=visible_reminder_ids(user))
+
+
 class ReminderLog(models.Model):
     reminder = models.ForeignKey(Reminder, on_delete=models.CASCADE, related_name="logs")
     taken_at = models.DateTimeField(auto_now_add=True)
     was_taken = models.BooleanField(default=False)
     notes = models.TextField(blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = ReminderLogQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Orden estable para la paginación por cursor de los logs
+            models.Index(fields=["reminder", "-taken_at", "-id"], name="reminderlog_reminder_taken_idx"),
+            # Cambios desde un token de sincronización (reminders.sync)
+            models.Index(fields=["reminder", "updated_at"], name="reminderlog_reminder_upd_idx"),
+        ]
 
     def __str__(self):
         return f"{self.reminder.title} - {'Taken' if self.was_taken else 'Missed'} at {self.taken_at}"
+
+
+class DailyAdherence(models.Model):
+    """
+    Resumen diario de tomas por recordatorio, mantenido de forma incremental
+    al registrar cada ReminderLog (ver reminders.rollup). Permite leer la
+    adherencia de un rango en O(días) en lugar de O(logs).
+    """
+    patient = models.ForeignKey(User, on_delete=models.CASCADE, related_name="daily_adherence")
+    reminder = models.ForeignKey(Reminder, on_delete=models.CASCADE, related_name="daily_adherence")
+    day = models.DateField()
+    taken = models.PositiveIntegerField(default=0)
+    missed = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ("reminder", "day")
+        indexes = [
+            # Lectura por paciente y rango de fechas
+            models.Index(fields=["patient", "day"], name="dailyadherence_patient_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.reminder_id} @ {self.day}: {self.taken} tomadas, {self.missed} omitidas"
+
+
+class SyncTombstone(models.Model):
+    """
+    Registro de un objeto borrado (o que el usuario dejó de ver), para que
+    la sincronización incremental (reminders.sync) se lo informe al cliente.
+    Hay una fila por usuario afectado.
+    """
+    KIND_CHOICES = [
+        ("reminder", "Recordatorio"),
+        ("medication", "Medicamento"),
+        ("reminder_log", "Registro de toma"),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="sync_tombstones")
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "deleted_at"], name="synctombstone_user_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.object_id} borrado para {self.user_id}"
@@ -0,0 +1,77 @@
+"""
+Cálculo de disparos de un Reminder según su frecuencia.
+
+Compartido por ReminderSerializer (primer disparo) y el scheduler (siguiente
+disparo). Todas las operaciones son O(1): después de una caída no se avanza
+un intervalo por tick, se salta directo al siguiente disparo futuro.
+
+Los intervalos son absolutos: se calculan en UTC, igual que se guardan. Un
+recordatorio diario conserva su hora UTC y su hora local se corre con el
+horario de verano.
+"""
+from datetime import timezone as dt_timezone
+
+from django.conf import settings
+from django.utils import timezone
+
+
+def _utc(value):
+    # Un datetime naive se interpreta en la zona horaria activa
+    if timezone.is_naive(value):
+        value = timezone.make_aware(value)
+    return value.astimezone(dt_timezone.utc)
+
+
+def get_step(frequency, interval_hours=None):
+    """Intervalo entre disparos, o None si el recordatorio no se repite."""
+    if frequency == "daily":
+        return timezone.timedelta(days=1)
+
+    if frequency == "weekly":
+        return timezone.timedelta(weeks=1)
+
+    if frequency == "custom" and interval_hours:
+        return timezone.timedelta(hours=interval_hours)
+
+    return None
+
+
+def first_occurrence(start_time, frequency, interval_hours=None, now=None):
+    """
+    Primer disparo de un recordatorio nuevo: start_time si aún no pasa,
+    o la siguiente ocurrencia posterior a now si ya pasó.
+    """
+    now = now or timezone.now()
+    start_time = _utc(start_time)
+    step = get_step(frequency, interval_hours)
+
+    if start_time >= now or step is None:
+        return start_time
+
+    return next_occurrence(start_time, frequency, interval_hours, now=now, coalesce=True)
+
+
+def next_occurrence(anchor, frequency, interval_hours=None, now=None, coalesce=None):
+    """
+    Siguiente disparo después de la ocurrencia `anchor` (la que acaba de dispararse).
+
+    Con coalesce (por defecto REMINDERS_COALESCE_MISSED_TRIGGERS) devuelve la primera
+    ocurrencia estrictamente posterior a now: los disparos perdidos se juntan en uno.
+    Sin coalesce devuelve anchor + intervalo y cada disparo perdido se envía.
+    Devuelve None si el recordatorio no se repite.
+    """
+    step = get_step(frequency, interval_hours)
+    if step is None:
+        return None
+
+    anchor = _utc(anchor)
+    if coalesce is None:
+        coalesce = settings.REMINDERS_COALESCE_MISSED_TRIGGERS
+    if not coalesce:
+        return anchor + step
+
+    now = now or timezone.now()
+    if anchor > now:
+        return anchor + step
+
+    return anchor + step * ((now - anchor) // step + 1)
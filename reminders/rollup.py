@@ -0,0 +1,129 @@
+from collections import defaultdict
+
+from django.db import IntegrityError, connection, models, transaction
+from django.db.models.functions import Greatest, TruncDate
+from django.utils import timezone
+
+from .models import DailyAdherence, Reminder, ReminderLog
+
+
+def _day(log):
+    # Mismo día local que TruncDate("taken_at") con la zona horaria activa
+    return timezone.localdate(log.taken_at)
+
+
+def _apply(patient_id, reminder_id, day, taken, missed):
+    """
+    Suma (o resta, con valores negativos) tomas al resumen del día.
+    UPDATE con F() primero; si la fila aún no existe se inserta, y si otra
+    transacción la insertó al mismo tiempo se reintenta el UPDATE.
+    Las restas no bajan de 0: un resumen desfasado (p. ej. antes del
+    backfill) no debe romper el CHECK de los PositiveIntegerField.
+    """
+    changes = {
+        "taken": Greatest(models.F("taken") + taken, 0),
+        "missed": Greatest(models.F("missed") + missed, 0),
+    }
+    rows = DailyAdherence.objects.filter(reminder_id=reminder_id, day=day).update(**changes)
+    if rows or taken < 0 or missed < 0:
+        return
+    try:
+        with transaction.atomic():
+            DailyAdherence.objects.create(
+                patient_id=patient_id, reminder_id=reminder_id, day=day, taken=taken, missed=missed
+            )
+    except IntegrityError:
+        DailyAdherence.objects.filter(reminder_id=reminder_id, day=day).update(**changes)
+
+
+def record_log(log, sign=1):
+    """
+    Refleja un ReminderLog en DailyAdherence (sign=-1 para descontarlo).
+    Debe llamarse en la misma transacción que escribe el log.
+    """
+    record_logs([log], sign)
+
+
+def record_logs(logs, sign=1):
+    """
+    Como record_log para varios logs: los agrupa por (recordatorio, día) y
+    los suma con un solo INSERT ... ON CONFLICT DO UPDATE, o con un upsert
+    por grupo al descontar o si la base de datos no lo soporta.
+    `log.reminder` debe estar cargado.
+    """
+    groups = defaultdict(lambda: [0, 0])
+    for log in logs:
+        counts = groups[(log.reminder.patient_id, log.reminder_id, _day(log))]
+        counts[0 if log.was_taken else 1] += sign
+    if not groups:
+        return
+    if sign > 0 and connection.features.supports_update_conflicts_with_target:
+        _upsert(groups)
+        return
+    for (patient_id, reminder_id, day), (taken, missed) in groups.items():
+        _apply(patient_id, reminder_id, day, taken, missed)
+
+
+def _upsert(groups):
+    table = connection.ops.quote_name(DailyAdherence._meta.db_table)
+    values = ", ".join(["(%s, %s, %s, %s, %s)"] * len(groups))
+    params = [
+        value
+        for (patient_id, reminder_id, day), (taken, missed) in groups.items()
+        for value in (patient_id, reminder_id, day, taken, missed)
+    ]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} (patient_id, reminder_id, day, taken, missed) VALUES {values} "
+            f"ON CONFLICT (reminder_id, day) DO UPDATE SET "
+            f"taken = {table}.taken + EXCLUDED.taken, missed = {table}.missed + EXCLUDED.missed",
+            params,
+        )
+
+
+def rebuild(reminder_ids):
+    """
+    Recalcula desde ReminderLog los resúmenes de los recordatorios indicados.
+    Devuelve el número de filas de resumen creadas.
+    """
+    rows = (
+        ReminderLog.objects.filter(reminder_id__in=reminder_ids)
+        .annotate(day=TruncDate("taken_at"))
+        .values("reminder_id", "reminder__patient_id", "day")
+        .annotate(
+            taken=models.Count("id", filter=models.Q(was_taken=True)),
+            missed=models.Count("id", filter=models.Q(was_taken=False)),
+        )
+        .order_by()
+    )
+    with transaction.atomic():
+        DailyAdherence.objects.filter(reminder_id__in=reminder_ids).delete()
+        created = DailyAdherence.objects.bulk_create(
+            [
+                DailyAdherence(
+                    patient_id=row["reminder__patient_id"],
+                    reminder_id=row["reminder_id"],
+                    day=row["day"],
+                    taken=row["taken"],
+                    missed=row["missed"],
+                )
+                for row in rows
+            ]
+        )
+    return len(created)
+
+
+def backfill(chunk_size=500):
+    """
+    Reconstruye todo DailyAdherence por bloques de recordatorios (por id),
+    una transacción por bloque. Genera (recordatorios, filas) por bloque.
+    """
+    last_id = 0
+    while True:
+        reminder_ids = list(
+            Reminder.objects.filter(pk__gt=last_id).order_by("pk").values_list("pk", flat=True)[:chunk_size]
+        )
+        if not reminder_ids:
+            return
+        yield len(reminder_ids), rebuild(reminder_ids)
+        last_id = reminder_ids[-1]
@@ -1,122 +1,541 @@
+from apscheduler.executors.pool import ThreadPoolExecutor
 from apscheduler.schedulers.background import BackgroundScheduler
 from django.utils import timezone
-from django.db import transaction
+from django.db import connection, transaction
+from django.db.models import Case, F, Q, Value, When
+from django.db.models.functions import Cast
 from django.conf import settings
 
-from reminders.models import Reminder
+from reminders.models import Reminder, ReminderAccess, NotificationOutbox
+from reminders.timer import start_reminder_timer, stop_reminder_timer
+from reminders.sharding import filter_shard
+from reminders.recurrence import get_step, next_occurrence
+from reminders.fcm_async import get_async_dispatcher
 from users.models import CustomFCMDevice
+from users.tokens import purge_expired_tokens
 from firebase_admin import messaging
+from firebase_admin.exceptions import InvalidArgumentError
+from fcm_django.models import MAX_MESSAGES_PER_BATCH
 
 import logging
+import os
+import socket
+import time
+from collections import defaultdict
+from functools import partial
 logger = logging.getLogger()
 
 
-def send_push_to_reminder_users(reminder: Reminder):
-    """Obtiene el paciente, creador y usuarios con acceso y les envía push."""
-    logger.info(f"Enviando notificaciones para reminder {reminder.id}...")
+def get_worker_id():
+    """Identificador del proceso actual, usado como dueño del lease."""
+    return f"{socket.gethostname()}:{os.getpid()}"
 
-    users_to_notify = reminder.get_all_receivers()
-
-    devices = CustomFCMDevice.objects.filter(user__in=users_to_notify)
-    logger.info(f"Se encontraron {devices.count()} dispositivos FCM para reminder {reminder.id}")
-
-    if not devices.exists():
-        logger.info(f"No hay dispositivos FCM para reminder {reminder.id}")
-        return
 
+def build_reminder_payload(reminder: Reminder):
+    """Construye el payload de la notificación de un reminder."""
     patient = reminder.patient
-
-    payload = {
+    return {
         "title": f"Recordatorio: {reminder.title}",
         "body": f"Paciente {patient.first_name} {patient.last_name}: {reminder.message}",
-        "reminder_id": str(reminder.id), 
+        "reminder_id": str(reminder.id),
     }
 
-    logger.info(f"Payload para reminder {reminder.id}: {payload}")
 
-    # Crear mensaje de Firebase
-    message = messaging.Message(
+def build_reminder_message(payload, token):
+    """Crea el mensaje de Firebase para un token específico."""
+    return messaging.Message(
+        token=token,
         notification=messaging.Notification(
             title=payload["title"],
             body=payload["body"]
         ),
-        data=payload  
+        data=payload
     )
 
-    try:
-        for device in devices:  
-            response = device.send_message(message)
-            logger.info(f"Notificación enviada al dispositivo {device.id} (usuario {device.user.first_name}): {response}")
-    except Exception as e:
-        logger.info(f"Error enviando notificaciones para reminder {reminder.id}: {e}")
+
+def send_messages(messages):
+    """
+    Envía una lista de mensajes y devuelve un SendResponse por mensaje.
+    Usa el dispatcher asíncrono HTTP/2 si REMINDERS_ASYNC_PUSH está activo,
+    si no, send_each de firebase_admin (máximo 500 mensajes por llamada).
+    """
+    if settings.REMINDERS_ASYNC_PUSH:
+        return get_async_dispatcher().send_each(messages)
+    return messaging.send_each(messages).responses
+
+
+def is_dead_token_error(exception):
+    """True si FCM indica que el token ya no es válido (UNREGISTERED / INVALID_ARGUMENT)."""
+    if isinstance(exception, (messaging.UnregisteredError, messaging.SenderIdMismatchError)):
+        return True
+    # INVALID_ARGUMENT también se usa para payloads inválidos: solo cuenta si es el token
+    return isinstance(exception, InvalidArgumentError) and "registration token" in str(exception).lower()
+
+
+def prune_dead_tokens(results):
+    """
+    Desactiva (o elimina, según DELETE_INACTIVE_DEVICES) en una sola operación
+    los dispositivos cuyos tokens FCM rechazó en un lote.
+    results es un iterable de (registration_id, SendResponse).
+    """
+    dead_tokens = {token for token, response in results if is_dead_token_error(response.exception)}
+    if not dead_tokens:
+        return dead_tokens
+
+    devices = CustomFCMDevice.objects.filter(registration_id__in=dead_tokens)
+    if settings.FCM_DJANGO_SETTINGS.get("DELETE_INACTIVE_DEVICES"):
+        devices.delete()
     else:
-        logger.info(f"Notificaciones enviadas para reminder {reminder.id}")
+        devices.update(active=False)
 
-def update_next_trigger(reminder):
-    """Genera el siguiente horario según la frecuencia."""
-    if reminder.frequency == "once":
-        reminder.is_active = False
-        return
+    logger.info(f"Se depuraron {len(dead_tokens)} tokens FCM inválidos")
+    return dead_tokens
 
-    if reminder.frequency == "daily":
-        reminder.next_trigger_time += timezone.timedelta(days=1)
-        return
 
-    if reminder.frequency == "hourly":
-        reminder.next_trigger_time += timezone.timedelta(hours=1)
-        return
+def resolve_registration_tokens(reminders):
+    """
+    Resuelve los tokens FCM de los receptores de un lote de reminders.
 
-    if reminder.frequency == "custom" and reminder.interval_hours:
-        reminder.next_trigger_time += timezone.timedelta(hours=reminder.interval_hours)
-        return
+    Devuelve {reminder_id: [registration_id, ...]} usando siempre dos queries
+    (accesos compartidos y dispositivos), sin importar el tamaño del lote:
+    el paciente y el creador salen de las columnas del propio reminder.
+    """
+    receivers = defaultdict(set)
+    for reminder in reminders:
+        receivers[reminder.id].add(reminder.patient_id)
+        if reminder.created_by_id:
+            receivers[reminder.id].add(reminder.created_by_id)
+
+    if not receivers:
+        return {}
+
+    shared = ReminderAccess.objects.filter(
+        reminder_id__in=receivers.keys(), receive_notifications=True
+    ).values_list("reminder_id", "user_id")
+    for reminder_id, user_id in shared:
+        receivers[reminder_id].add(user_id)
+
+    user_ids = set().union(*receivers.values())
+    tokens_by_user = defaultdict(list)
+    devices = CustomFCMDevice.objects.filter(user_id__in=user_ids, active=True).values_list(
+        "user_id", "registration_id"
+    )
+    for user_id, token in devices:
+        tokens_by_user[user_id].append(token)
+
+    tokens_by_reminder = {}
+    for reminder_id, user_ids in receivers.items():
+        # dict.fromkeys: sin duplicados y conservando el orden
+        tokens = dict.fromkeys(token for user_id in user_ids for token in tokens_by_user[user_id])
+        tokens_by_reminder[reminder_id] = list(tokens)
+
+    return tokens_by_reminder
+
+
+def send_push_batch(reminders):
+    """
+    Envía los pushes de un lote de reminders agrupando los tokens de todos
+    los dispositivos en llamadas send_each de hasta 500 mensajes (límite de FCM),
+    o en un solo envío concurrente si REMINDERS_ASYNC_PUSH está activo.
+
+    Devuelve un dict {reminder_id: [(registration_id, SendResponse), ...]}
+    con el resultado individual de cada token.
+    """
+    pending = []  # (reminder_id, registration_id, message)
+    tokens_by_reminder = resolve_registration_tokens(reminders)
+
+    for reminder in reminders:
+        tokens = tokens_by_reminder.get(reminder.id)
+        if not tokens:
+            logger.info(f"No hay dispositivos FCM para reminder {reminder.id}")
+            continue
+
+        payload = build_reminder_payload(reminder)
+        for token in tokens:
+            pending.append((reminder.id, token, build_reminder_message(payload, token)))
+
+    results = {}
+    if not pending:
+        return results
+
+    logger.info(f"Enviando {len(pending)} notificaciones para {len(reminders)} recordatorios...")
+
+    if settings.REMINDERS_ASYNC_PUSH:
+        # El dispatcher asíncrono acota la concurrencia por sí mismo
+        chunks = [pending]
+    else:
+        chunks = [pending[i:i + MAX_MESSAGES_PER_BATCH] for i in range(0, len(pending), MAX_MESSAGES_PER_BATCH)]
+
+    for chunk in chunks:
+        try:
+            responses = send_messages([message for _, _, message in chunk])
+        except Exception as e:
+            # Falla del lote completo (credenciales, red, etc.)
+            logger.info(f"Error enviando lote de {len(chunk)} notificaciones: {e}")
+            responses = [messaging.SendResponse(None, e)] * len(chunk)
+
+        for (reminder_id, token, _), response in zip(chunk, responses):
+            results.setdefault(reminder_id, []).append((token, response))
+
+        failures = sum(1 for response in responses if response.exception)
+        logger.info(f"Lote enviado: {len(responses) - failures} exitosas, {failures} fallidas")
+
+        prune_dead_tokens(
+            (token, response) for (_, token, _), response in zip(chunk, responses)
+        )
+
+    return results
+
+
+def send_push_to_reminder_users(reminder: Reminder):
+    """Obtiene el paciente, creador y usuarios con acceso y les envía push."""
+    logger.info(f"Enviando notificaciones para reminder {reminder.id}...")
+    return send_push_batch([reminder]).get(reminder.id, [])
+
+def _update_leased(model, objs, fields, worker_id, batch_size=500):
+    """
+    Como bulk_update, pero solo escribe las filas que siguen reclamadas por
+    worker_id: si el lease expiró y otro worker las tomó, no se pisa su trabajo.
+    Devuelve el número de filas actualizadas.
+    """
+    updated = 0
+    for start in range(0, len(objs), batch_size):
+        batch = objs[start:start + batch_size]
+        changes = {}
+        for name in fields:
+            field = model._meta.get_field(name)
+            value = Case(
+                *[When(pk=obj.pk, then=Value(getattr(obj, name), output_field=field)) for obj in batch],
+                output_field=field,
+            )
+            # Igual que bulk_update: Postgres necesita el CASE casteado al tipo de la columna
+            changes[name] = Cast(value, output_field=field) if connection.features.requires_casted_case_in_updates else value
+        updated += model.objects.filter(pk__in=[obj.pk for obj in batch], lease_owner=worker_id).update(**changes)
+    return updated
+
+
+def advance_reminders(reminders, worker_id, finished_ids=()):
+    """
+    Avanza next_trigger_time de un lote de reminders y libera sus leases.
+
+    En lugar de un save() por fila se agrupan los reminders por intervalo y se
+    ejecuta un solo UPDATE por grupo (next_trigger_time = next_trigger_time + intervalo),
+    así el número de queries depende de los intervalos distintos y no del tamaño del lote.
+    Los reminders atrasados más de un intervalo (p. ej. tras una caída) saltan
+    directo a su siguiente disparo futuro.
+    finished_ids son reminders que deben desactivarse (p. ej. medicación finalizada).
+    Cada UPDATE exige lease_owner=worker_id: un reminder cuyo lease expiró y
+    reclamó otro worker no se avanza dos veces.
+    """
+    now = timezone.now()
+    release = {"lease_owner": None, "lease_expires_at": None}
+    leased = Reminder.objects.filter(lease_owner=worker_id)
+    to_deactivate = set(finished_ids)
+    by_step = defaultdict(list)
+    behind = []
+
+    for reminder in reminders:
+        if reminder.id in to_deactivate:
+            continue
+
+        next_time = next_occurrence(
+            reminder.next_trigger_time, reminder.frequency, reminder.interval_hours, now=now
+        )
+        if next_time is None:
+            # "once" o frecuencia sin intervalo: no se vuelve a disparar
+            to_deactivate.add(reminder.id)
+            continue
+
+        step = get_step(reminder.frequency, reminder.interval_hours)
+        if next_time == reminder.next_trigger_time + step:
+            by_step[step].append(reminder.id)
+        else:
+            reminder.next_trigger_time = next_time
+            behind.append(reminder)
+
+    updated = 0
+    if to_deactivate:
+        # updated_at a mano: update() no lo toca y el cambio debe llegar a /sync/
+        updated += leased.filter(id__in=to_deactivate).update(
+            is_active=False, updated_at=timezone.now(), **release
+        )
+
+    for step, ids in by_step.items():
+        updated += leased.filter(id__in=ids).update(
+            next_trigger_time=F("next_trigger_time") + step, **release
+        )
 
+    if behind:
+        for reminder in behind:
+            reminder.lease_owner = None
+            reminder.lease_expires_at = None
+        updated += _update_leased(
+            Reminder, behind, ["next_trigger_time", "lease_owner", "lease_expires_at"], worker_id
+        )
 
-def process_reminders():
-    """Procesa los reminders cuya hora de disparo ya llegó."""
+    if updated < len(reminders):
+        logger.info(f"{len(reminders) - updated} recordatorios perdieron su lease (worker {worker_id}).")
+    return updated
+
+
+def _claim_rows(queryset, worker_id, batch_size, lease_seconds, order_by):
+    """
+    Reclama de forma atómica un lote acotado de filas del queryset.
+
+    Usa SELECT ... FOR UPDATE SKIP LOCKED (en Postgres) para que varios
+    workers o nodos puedan procesar la cola al mismo tiempo sin tomar las
+    mismas filas. Un reclamo cuyo lease expiró (worker caído) vuelve a
+    estar disponible para los demás.
+    """
+    now = timezone.now()
+
+    with transaction.atomic():
+        claimed_ids = list(
+            queryset.select_for_update(skip_locked=True)
+            .filter(Q(lease_expires_at__isnull=True) | Q(lease_expires_at__lt=now))
+            .order_by(order_by)
+            .values_list("id", flat=True)[:batch_size]
+        )
+        if not claimed_ids:
+            return []
+
+        queryset.model.objects.filter(id__in=claimed_ids).update(
+            lease_owner=worker_id,
+            lease_expires_at=now + timezone.timedelta(seconds=lease_seconds),
+        )
+
+    return claimed_ids
+
+
+def claim_due_reminders(worker_id, batch_size=None, lease_seconds=None, shard=None):
+    """Reclama un lote de reminders cuya hora de disparo ya llegó."""
+    claimed_ids = _claim_rows(
+        filter_shard(
+            Reminder.objects.filter(is_active=True, next_trigger_time__lte=timezone.now()),
+            "id",
+            shard,
+        ),
+        worker_id,
+        batch_size or settings.REMINDERS_BATCH_SIZE,
+        lease_seconds or settings.REMINDERS_LEASE_SECONDS,
+        "next_trigger_time",
+    )
+    if not claimed_ids:
+        return []
+
+    return list(
+        Reminder.objects.filter(id__in=claimed_ids, lease_owner=worker_id)
+        .select_related("patient", "created_by", "medication")
+    )
+
+
+def claim_outbox_entries(worker_id, batch_size=None, lease_seconds=None, shard=None):
+    """Reclama un lote de notificaciones pendientes del outbox."""
+    claimed_ids = _claim_rows(
+        filter_shard(
+            NotificationOutbox.objects.filter(status="pending", available_at__lte=timezone.now()),
+            "reminder_id",
+            shard,
+        ),
+        worker_id,
+        batch_size or settings.REMINDERS_BATCH_SIZE,
+        lease_seconds or settings.REMINDERS_LEASE_SECONDS,
+        "available_at",
+    )
+    if not claimed_ids:
+        return []
+
+    return list(
+        NotificationOutbox.objects.filter(id__in=claimed_ids, lease_owner=worker_id)
+        .select_related("reminder__patient")
+    )
+
+
+def process_reminders(worker_id=None, batch_size=None, shard=None, budget=None):
+    """
+    Procesa los reminders cuya hora de disparo ya llegó.
+
+    El tick no habla con FCM: por cada lote reclamado, en una transacción
+    corta avanza next_trigger_time y encola una fila en NotificationOutbox
+    por disparo. El envío lo hace dispatch_outbox por separado.
+    Reclama lotes hasta vaciar la cola (un lote incompleto) o agotar
+    `budget` segundos (REMINDERS_TICK_BUDGET_SECONDS); lo que quede lo
+    toma el siguiente tick. Devuelve cuántos reminders procesó.
+    """
     
     logger.info(f" Empezando procesamiento de recordatorios...")
-    now = timezone.now()
+    worker_id = worker_id or get_worker_id()
+    batch_size = batch_size or settings.REMINDERS_BATCH_SIZE
+    deadline = time.monotonic() + (budget or settings.REMINDERS_TICK_BUDGET_SECONDS)
 
-    due_reminders = Reminder.objects.filter(
-        is_active=True,
-        next_trigger_time__lte=now
-    ).select_related("patient", "created_by")
+    processed = 0
+    while True:
+        claimed = _process_batch(worker_id, batch_size, shard)
+        processed += claimed
+        if claimed < batch_size:
+            break
+        if time.monotonic() >= deadline:
+            logger.info(f"Tick sin tiempo tras {processed} recordatorios; el resto sigue en el próximo.")
+            break
+    return processed
 
-    if not due_reminders.exists():
-        return
 
-    logger.info(f"Procesando {due_reminders.count()} recordatorios pendientes...")
+def _process_batch(worker_id, batch_size, shard):
+    """Reclama, avanza y encola un lote. Devuelve cuántos reminders reclamó."""
+    now = timezone.now()
+    due_reminders = claim_due_reminders(worker_id, batch_size=batch_size, shard=shard)
+
+    if not due_reminders:
+        return 0
+
+    logger.info(f"Procesando {len(due_reminders)} recordatorios pendientes (worker {worker_id})...")
 
+    entries = []
+    finished_ids = []
     for reminder in due_reminders:
         if reminder.medication.end_date and reminder.medication.end_date < now.date():
-            reminder.is_active = False
-            reminder.save()
+            finished_ids.append(reminder.id)
             logger.info(f"Reminder {reminder.id} desactivado (medicación finalizada).")
             continue
+        entries.append(NotificationOutbox(reminder=reminder, scheduled_for=reminder.next_trigger_time))
 
-        with transaction.atomic():
-            send_push_to_reminder_users(reminder)
-            update_next_trigger(reminder)
-            reminder.save()
+    with transaction.atomic():
+        advance_reminders(due_reminders, worker_id, finished_ids)
+        # ignore_conflicts: si el disparo ya estaba encolado no se duplica
+        NotificationOutbox.objects.bulk_create(entries, ignore_conflicts=True, batch_size=500)
+
+    logger.info(f"Procesamiento completado: {len(entries)} notificaciones encoladas.")
+    return len(due_reminders)
 
-    logger.info("Procesamiento completado.")
+
+def dispatch_outbox(worker_id=None, batch_size=None, shard=None):
+    """
+    Drena un lote del outbox y envía las notificaciones a FCM.
+    Varias instancias pueden correr en paralelo: cada una reclama filas distintas.
+    """
+    worker_id = worker_id or get_worker_id()
+    entries = claim_outbox_entries(worker_id, batch_size=batch_size, shard=shard)
+
+    if not entries:
+        return
+
+    logger.info(f"Despachando {len(entries)} notificaciones del outbox (worker {worker_id})...")
+
+    results = send_push_batch([entry.reminder for entry in entries])
+
+    now = timezone.now()
+    for entry in entries:
+        responses = results.get(entry.reminder_id, [])
+        errors = [response.exception for _, response in responses if response.exception]
+
+        if responses and len(errors) == len(responses):
+            # Ningún dispositivo recibió el push: se reintenta con backoff
+            entry.attempts += 1
+            entry.last_error = str(errors[0])
+            if entry.attempts >= settings.REMINDERS_OUTBOX_MAX_ATTEMPTS:
+                entry.status = "failed"
+            else:
+                entry.available_at = now + timezone.timedelta(seconds=2 ** entry.attempts)
+        else:
+            entry.status = "sent"
+            entry.sent_at = now
+
+        entry.lease_owner = None
+        entry.lease_expires_at = None
+
+    _update_leased(
+        NotificationOutbox,
+        entries,
+        ["status", "attempts", "last_error", "available_at", "sent_at", "lease_owner", "lease_expires_at"],
+        worker_id,
+    )
+
+    logger.info("Despacho del outbox completado.")
+
+
+def purge_outbox(batch_size=None, pause=0):
+    """
+    Borra las filas del outbox ya enviadas o fallidas más viejas que
+    REMINDERS_OUTBOX_RETENTION_DAYS, en lotes cortos como purge_expired_tokens.
+    Las pendientes se conservan. Recorre por id: los ids más viejos son los
+    primeros en vencer. Devuelve cuántas filas borró.
+    """
+    batch_size = batch_size or settings.REMINDERS_OUTBOX_PURGE_BATCH_SIZE
+    cutoff = timezone.now() - timezone.timedelta(days=settings.REMINDERS_OUTBOX_RETENTION_DAYS)
+    deleted = 0
+    while True:
+        with transaction.atomic():
+            ids = list(
+                NotificationOutbox.objects.filter(status__in=("sent", "failed"), created_at__lt=cutoff)
+                .order_by("id")
+                .values_list("id", flat=True)[:batch_size]
+            )
+            if not ids:
+                return deleted
+            NotificationOutbox.objects.filter(id__in=ids).delete()
+        deleted += len(ids)
+        if pause:
+            time.sleep(pause)
 
 
 scheduler = None
 
 
-def start_reminder_scheduler():
+def start_reminder_scheduler(interval=5, batch_size=None, concurrency=None, shard=None):
     """
-    Inicia solo 1 instancia del scheduler global, incluso en producción.
+    Inicia el scheduler de recordatorios de este proceso: el tick (por intervalo
+    o por eventos) y los dispatchers del outbox. Lo usa run_reminder_worker;
+    los procesos web no lo inician.
     """
     global scheduler
 
     if scheduler and scheduler.running:
         logger.info("Scheduler ya estaba iniciado, se omite.")
-        return
+        return scheduler
+
+    concurrency = concurrency or settings.REMINDERS_DISPATCH_CONCURRENCY
+    job_kwargs = {"batch_size": batch_size, "shard": shard}
 
-    scheduler = BackgroundScheduler()
-    scheduler.add_job(process_reminders, "interval", seconds=5)
+    # Un hilo por dispatcher concurrente, uno para el tick y uno por cada purga periódica
+    threads = concurrency + 1 + sum(
+        1 for minutes in (settings.JWT_PURGE_INTERVAL_MINUTES, settings.REMINDERS_OUTBOX_PURGE_INTERVAL_MINUTES) if minutes
+    )
+    scheduler = BackgroundScheduler(executors={"default": ThreadPoolExecutor(threads)})
+    if settings.REMINDERS_SCHEDULER_MODE == "timer":
+        # Duerme hasta el siguiente disparo en lugar de consultar cada intervalo
+        start_reminder_timer(partial(process_reminders, **job_kwargs), shard=shard)
+    else:
+        scheduler.add_job(process_reminders, "interval", seconds=interval, kwargs=job_kwargs)
+    scheduler.add_job(
+        dispatch_outbox,
+        "interval",
+        seconds=1,
+        kwargs=job_kwargs,
+        max_instances=concurrency,
+    )
+    if settings.JWT_PURGE_INTERVAL_MINUTES:
+        # Mantenimiento de la blacklist de JWT; corre aquí para no cargar a los procesos web
+        scheduler.add_job(purge_expired_tokens, "interval", minutes=settings.JWT_PURGE_INTERVAL_MINUTES)
+    if settings.REMINDERS_OUTBOX_PURGE_INTERVAL_MINUTES:
+        # Sin purga el outbox crece con cada disparo enviado
+        scheduler.add_job(purge_outbox, "interval", minutes=settings.REMINDERS_OUTBOX_PURGE_INTERVAL_MINUTES)
     scheduler.start()
 
     logger.info("Reminder Scheduler iniciado correctamente.")
+    return scheduler
+
+
+def stop_reminder_scheduler():
+    """
+    Detiene el scheduler esperando a que terminen el tick y los envíos en curso,
+    para que ningún lote reclamado quede a medias.
+    """
+    global scheduler
+
+    stop_reminder_timer()
+
+    if scheduler and scheduler.running:
+        scheduler.shutdown(wait=True)
+    scheduler = None
+
+    logger.info("Reminder Scheduler detenido.")
@@ -1,10 +1,9 @@
-from django.utils import timezone
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from .models import Reminder, ReminderAccess,ReminderLog
+from .recurrence import first_occurrence
 from medications.models import Medication
-from shared_access.models import SharedAccess 
-from django.db import models 
+from shared_access import access_graph
 from users.serializers import UserSerializer
 
 User = get_user_model()
@@ -46,12 +45,7 @@ class ReminderAccessSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("El paciente ya tiene acceso al recordatorio.")
         
 
-        shared_exists = SharedAccess.objects.filter(
-            (models.Q(owner=reminder.patient, shared_with=target_user) |
-             models.Q(owner=target_user, shared_with=reminder.patient)),
-        ).exists()
-
-        if not shared_exists:
+        if not access_graph.are_connected(reminder.patient, target_user):
             raise serializers.ValidationError(
                 "No existe un acceso compartido activo entre el paciente y este usuario."
             )
@@ -63,7 +57,7 @@ class ReminderAccessSerializer(serializers.ModelSerializer):
 # ReminderSerializer
 # ===============================
 class ReminderSerializer(serializers.ModelSerializer):
-    shared_with = ReminderAccessSerializer(source="shared_with.all", many=True, read_only=True)
+    shared_with = ReminderAccessSerializer(source="shared_access_list", many=True, read_only=True)
     medication_name = serializers.CharField(source="medication.name", read_only=True)
     patient_email = serializers.EmailField(source="patient.email", read_only=True)
     patient_name=serializers.CharField(source="patient.first_name", read_only=True)
@@ -127,10 +121,12 @@ class ReminderSerializer(serializers.ModelSerializer):
             # Si se está creando en nombre de un paciente (ej. doctor o cuidador)
             validated_data["created_by"] = user
         if(validated_data["frequency"]=="daily"):
-            validated_data["next_trigger_time"]=validated_data["start_time"] + timezone.timedelta(days=1)
             validated_data["interval_hours"]=24
-        if(validated_data["frequency"]=="custom" and validated_data.get("interval_hours")):
-            validated_data["next_trigger_time"]=validated_data["start_time"] + timezone.timedelta(hours=validated_data["interval_hours"])
+        validated_data["next_trigger_time"] = first_occurrence(
+            validated_data["start_time"],
+            validated_data["frequency"],
+            validated_data.get("interval_hours"),
+        )
         reminder = super().create(validated_data)
         return reminder
 
@@ -139,7 +135,9 @@ class ReminderSerializer(serializers.ModelSerializer):
         Añade campo 'total_shared' y lista simplificada de usuarios con acceso.
         """
         data = super().to_representation(instance)
-        data["total_shared"] = instance.shared_with.count()
+        # Sale de la misma lista ya cargada (Reminder.objects.for_list()), sin queries extra
+        accesses = instance.shared_access_list
+        data["total_shared"] = len(accesses)
         data["shared_users"] = [
             {
                 "id": a.user.id,
@@ -147,7 +145,7 @@ class ReminderSerializer(serializers.ModelSerializer):
                 "can_edit": a.can_edit,
                 "receive_notifications": a.receive_notifications,
             }
-            for a in instance.shared_with.all()
+            for a in accesses
         ]
         return data
 
@@ -175,4 +173,17 @@ class ReminderLogSerializer(serializers.ModelSerializer):
         if not reminder.has_access(user):
             raise serializers.ValidationError("No tienes permiso para registrar logs en este recordatorio.")
 
-        return attrs
\ No newline at end of file
+        return attrs
+
+
+# ===============================
+# ReminderConfirmationSerializer
+# ===============================
+class ReminderConfirmationSerializer(serializers.Serializer):
+    """
+    Un elemento de la confirmación en lote (confirm-batch). Solo valida el
+    formato; el acceso a los recordatorios se valida para todo el lote junto.
+    """
+    reminder_id = serializers.IntegerField(min_value=1)
+    was_taken = serializers.BooleanField()
+    notes = serializers.CharField(required=False, allow_blank=True, allow_null=True, default="")
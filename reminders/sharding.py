@@ -0,0 +1,25 @@
+"""
+Reparto de la cola de recordatorios entre workers dedicados (run_reminder_worker
+--shard). Un shard es (shard_id, total_shards) y le toca cada fila cuyo id
+cumple id % total_shards == shard_id. Lo usan el scheduler y el timer.
+"""
+from django.db.models.functions import Mod
+
+
+def filter_shard(queryset, field, shard):
+    """
+    Limita el queryset a un shard (shard_id, total_shards) según field % total_shards,
+    para que cada worker dedicado compita solo por su parte de la cola.
+    """
+    if not shard:
+        return queryset
+    shard_id, total_shards = shard
+    return queryset.alias(shard_key=Mod(field, total_shards)).filter(shard_key=shard_id)
+
+
+def in_shard(object_id, shard):
+    """True si el id le toca al shard (siempre, sin shard)."""
+    if not shard:
+        return True
+    shard_id, total_shards = shard
+    return object_id % total_shards == shard_id
@@ -0,0 +1,154 @@
+from django.contrib.auth import get_user_model
+from django.db.models import QuerySet
+from collections import defaultdict
+
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+from medications.models import Medication
+from .models import Reminder, ReminderAccess, ReminderLog, SyncTombstone
+from . import timer
+
+@receiver(post_save, sender=Reminder)
+def reschedule_reminder_on_save(sender, instance, **kwargs):
+    """
+    Inserta o mueve el disparo del reminder en el timer: el de este proceso
+    (si está activo) y, vía pg_notify, el del worker de recordatorios.
+    """
+    trigger_time = instance.next_trigger_time if instance.is_active else None
+    timer.notify_change(instance.id, trigger_time)
+
+    if not timer.active_timer:
+        return
+
+    if trigger_time:
+        timer.active_timer.schedule(instance.id, trigger_time)
+    else:
+        timer.active_timer.cancel(instance.id)
+
+@receiver(post_delete, sender=Reminder)
+def cancel_reminder_on_delete(sender, instance, **kwargs):
+    """
+    Cancela el disparo pendiente de un reminder eliminado (en este proceso y en el worker).
+    """
+    timer.notify_change(instance.id, None)
+    if timer.active_timer:
+        timer.active_timer.cancel(instance.id)
+
+
+# ===============================
+# Tombstones para la sincronización incremental (reminders.sync)
+# ===============================
+def _origin_model(origin):
+    return origin.model if isinstance(origin, QuerySet) else type(origin)
+
+
+def _skips_tombstones(origin):
+    # Al borrar varios usuarios a la vez no queda nadie a quien avisar
+    return isinstance(origin, QuerySet) and origin.model is get_user_model()
+
+
+def _tombstone(kind, object_id, user_ids, origin):
+    """
+    Crea un tombstone por usuario afectado. Si el borrado viene de eliminar
+    usuarios, no se crean para esos usuarios (su fila también se borra).
+    """
+    if _skips_tombstones(origin):
+        return
+    if _origin_model(origin) is get_user_model():
+        user_ids = [user_id for user_id in user_ids if user_id != origin.pk]
+    SyncTombstone.objects.bulk_create(
+        [SyncTombstone(user_id=user_id, kind=kind, object_id=object_id) for user_id in set(user_ids)]
+    )
+
+
+@receiver(post_delete, sender=Reminder)
+def tombstone_reminder(sender, instance, origin=None, **kwargs):
+    # Los usuarios con acceso compartido reciben el suyo al borrarse su ReminderAccess
+    _tombstone("reminder", instance.pk, [instance.patient_id], origin)
+
+
+@receiver(post_save, sender=ReminderAccess)
+@receiver(post_delete, sender=ReminderAccess)
+def touch_shared_reminder(sender, instance, origin=None, **kwargs):
+    """
+    Los accesos se serializan dentro del recordatorio (shared_with): al
+    compartir, revocar o cambiar un acceso se actualiza su updated_at para
+    que el cambio llegue a /sync/ de todos los que lo ven.
+    """
+    if _origin_model(origin) in (Reminder, Medication):
+        return  # el recordatorio se está borrando
+    Reminder.objects.filter(pk=instance.reminder_id).update(updated_at=timezone.now())
+
+
+@receiver(post_delete, sender=ReminderAccess)
+def tombstone_revoked_reminder(sender, instance, origin=None, **kwargs):
+    """
+    Revocar un acceso (o borrar el recordatorio) hace que ese usuario deje de verlo.
+    """
+    _tombstone("reminder", instance.reminder_id, [instance.user_id], origin)
+
+
+def _skips_log_tombstones(origin):
+    # Si se borra el recordatorio (o su medicamento o paciente), el cliente descarta sus logs
+    return _origin_model(origin) in (Reminder, Medication, get_user_model())
+
+
+@receiver(pre_delete, sender=ReminderLog)
+def collect_deleted_log(sender, instance, origin=None, **kwargs):
+    """
+    Junta los logs de un mismo borrado en `origin`: Django envía todos los
+    pre_delete antes del primer post_delete, así los tombstones se escriben
+    una sola vez por borrado y no una por log.
+    """
+    if origin is None or _skips_log_tombstones(origin):
+        return
+    if not hasattr(origin, "_sync_deleted_logs"):
+        origin._sync_deleted_logs = {}
+    origin._sync_deleted_logs[instance.pk] = instance
+
+
+@receiver(post_delete, sender=ReminderLog)
+def tombstone_reminder_log(sender, instance, origin=None, **kwargs):
+    logs = getattr(origin, "_sync_deleted_logs", None)
+    if not logs:
+        return
+    # Los demás post_delete de este borrado no tienen nada que hacer
+    origin._sync_deleted_logs = {}
+
+    reminder_ids = {log.reminder_id for log in logs.values()}
+    audience = defaultdict(set)
+    for reminder_id, user_id in Reminder.objects.filter(pk__in=reminder_ids).values_list("pk", "patient_id"):
+        audience[reminder_id].add(user_id)
+    for reminder_id, user_id in ReminderAccess.objects.filter(reminder_id__in=reminder_ids).values_list(
+        "reminder_id", "user_id"
+    ):
+        audience[reminder_id].add(user_id)
+    SyncTombstone.objects.bulk_create(
+        [
+            SyncTombstone(user_id=user_id, kind="reminder_log", object_id=pk)
+            for pk, log in logs.items()
+            for user_id in audience[log.reminder_id]
+        ]
+    )
+
+
+@receiver(pre_delete, sender=Medication)
+def collect_medication_audience(sender, instance, origin=None, **kwargs):
+    """
+    Usuarios que ven el medicamento: el paciente y quienes ven alguno de sus
+    recordatorios. Se calcula antes del borrado en cascada de esos recordatorios.
+    """
+    if _skips_tombstones(origin):
+        return
+    reminders = Reminder.objects.filter(medication=instance)
+    instance._sync_audience = {instance.patient_id}.union(
+        reminders.values_list("patient_id", flat=True),
+        ReminderAccess.objects.filter(reminder__in=reminders).values_list("user_id", flat=True),
+    )
+
+
+@receiver(post_delete, sender=Medication)
+def tombstone_medication(sender, instance, origin=None, **kwargs):
+    audience = getattr(instance, "_sync_audience", [instance.patient_id])
+    _tombstone("medication", instance.pk, audience, origin)
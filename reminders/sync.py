@@ -0,0 +1,125 @@
+import base64
+import binascii
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from medications.models import Medication
+
+from .models import Reminder, ReminderAccess, ReminderLog, SyncTombstone
+
+
+def parse_token(token):
+    """
+    Convierte el token de sincronización del cliente en un datetime.
+    Lanza ValueError si no es válido.
+    """
+    moment = parse_datetime(token)
+    if moment is None or timezone.is_naive(moment):
+        raise ValueError(token)
+    return moment
+
+
+def encode_cursor(token, since, last_ids):
+    """Cursor opaco de la página siguiente: token y since de la primera página y el último id de cada lista."""
+    state = [token.isoformat(), since.isoformat() if since else None, list(last_ids)]
+    return base64.urlsafe_b64encode(json.dumps(state).encode()).decode()
+
+
+def parse_cursor(cursor):
+    """
+    Inverso de encode_cursor: devuelve (token, since, last_ids).
+    Lanza ValueError si el cursor no es válido.
+    """
+    try:
+        token, since, last_ids = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        last_ids = tuple(int(last_id) for last_id in last_ids)
+    except (binascii.Error, TypeError, ValueError):
+        raise ValueError(cursor)
+    if len(last_ids) != 3:
+        raise ValueError(cursor)
+    return parse_token(token), parse_token(since) if since else None, last_ids
+
+
+def changes_since(user, since=None, cursor=None):
+    """
+    Recordatorios, medicamentos y logs visibles para `user` que cambiaron
+    desde `since` (datetime de parse_token), y los ids borrados o que dejó
+    de ver. Sin `since`, o si es más viejo que la retención de tombstones,
+    devuelve todo (`full`=True) y el cliente debe reemplazar sus datos.
+
+    El cliente aplica primero los borrados y luego los cambios (un acceso
+    revocado y vuelto a compartir aparece en ambos), y guarda `token` para
+    la siguiente llamada. Se repite una ventana de SYNC_OVERLAP_SECONDS
+    antes de `since` para no perder filas de transacciones que aún no
+    habían terminado; volver a recibirlas es inocuo.
+
+    Cada lista trae como máximo SYNC_PAGE_SIZE elementos en orden de id.
+    Si quedan más, `next` es el cursor (parse_cursor) de la página
+    siguiente, que conserva `since` y `token` de la primera; el cliente
+    agrega esas páginas y guarda `token` cuando `next` es None. Lo que
+    cambie mientras pagina tiene updated_at posterior al token y llega en
+    la siguiente sincronización.
+    """
+    if cursor is None:
+        now, last_ids = timezone.now(), (0, 0, 0)
+    else:
+        now, since, last_ids = parse_cursor(cursor)
+    reminders = Reminder.objects.visible_to(user)
+    logs = ReminderLog.objects.visible_to(user)
+    medications = Medication.objects.filter(
+        models.Q(patient=user) | models.Q(pk__in=Reminder.objects.visible_to(user).values("medication_id"))
+    )
+    deleted = {kind: [] for kind, _ in SyncTombstone.KIND_CHOICES}
+
+    full = since is None or since < now - timedelta(days=settings.SYNC_TOMBSTONE_RETENTION_DAYS)
+    if not full:
+        floor = since - timedelta(seconds=settings.SYNC_OVERLAP_SECONDS)
+        # Recordatorios compartidos recién: se envían completos aunque no hayan cambiado
+        shared = ReminderAccess.objects.filter(user=user, added_at__gt=floor).values("reminder_id")
+        reminders = reminders.filter(models.Q(updated_at__gt=floor) | models.Q(pk__in=shared))
+        logs = logs.filter(models.Q(updated_at__gt=floor) | models.Q(reminder_id__in=shared))
+        medications = medications.filter(
+            models.Q(updated_at__gt=floor)
+            | models.Q(pk__in=Reminder.objects.filter(pk__in=shared).values("medication_id"))
+        )
+        if cursor is None:
+            tombstones = SyncTombstone.objects.filter(user=user, deleted_at__gt=floor).values_list("kind", "object_id")
+            for kind, object_id in tombstones:
+                deleted[kind].append(object_id)
+
+    size = settings.SYNC_PAGE_SIZE
+    pages = [
+        list(queryset.filter(pk__gt=last_id).order_by("pk")[:size + 1])
+        for queryset, last_id in zip(
+            (reminders.for_list(), medications, logs.select_related("reminder", "reminder__medication")),
+            last_ids,
+        )
+    ]
+    has_more = any(len(page) > size for page in pages)
+    pages = [page[:size] for page in pages]
+    last_ids = [page[-1].pk if page else last_id for page, last_id in zip(pages, last_ids)]
+
+    return {
+        "token": now.isoformat(),
+        "full": full,
+        "next": encode_cursor(now, since, last_ids) if has_more else None,
+        "reminders": pages[0],
+        "medications": pages[1],
+        "logs": pages[2],
+        "deleted": deleted,
+    }
+
+
+def purge_tombstones():
+    """
+    Borra los tombstones más viejos que la retención; los clientes con un
+    token anterior reciben una sincronización completa.
+    """
+    cutoff = timezone.now() - timedelta(days=settings.SYNC_TOMBSTONE_RETENTION_DAYS)
+    deleted, _ = SyncTombstone.objects.filter(deleted_at__lt=cutoff).delete()
+    return deleted
@@ -1,3 +1,725 @@
-from django.test import TestCase
+import asyncio
+import json
+import threading
+from datetime import date, datetime, time, timedelta
+from datetime import timezone as dt_timezone
+from zoneinfo import ZoneInfo
+from unittest import mock
 
-# Create your tests here.
+import httpx
+
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from firebase_admin import exceptions, messaging
+from rest_framework.test import APIClient
+
+from medications.models import Drug, DrugVariant, Medication
+from shared_access.models import SharedAccess
+from users.models import CustomFCMDevice, DoctorProfile, User
+
+from . import rollup
+from .adherence import _streaks
+from .fcm_async import AsyncFCMDispatcher
+from .recurrence import first_occurrence, get_step, next_occurrence
+from .models import DailyAdherence, NotificationOutbox, Reminder, ReminderAccess, ReminderLog, SyncTombstone
+from .scheduler import (
+    advance_reminders,
+    claim_due_reminders,
+    process_reminders,
+    purge_outbox,
+    resolve_registration_tokens,
+)
+from .timer import FALLBACK_LOOKAHEAD_SECONDS, ReminderTimer, notify_change
+
+
+def create_reminder(patient, created_by=None, title="amoxicilina", medication=None):
+    if medication is None:
+        drug, _ = Drug.objects.get_or_create(name="amoxicilina")
+        variant, _ = DrugVariant.objects.get_or_create(drug=drug, variant_name="500 mg", dosage="500 mg")
+        medication = Medication.objects.create(
+            patient=patient,
+            drug_variant=variant,
+            dosage_instructions="cada 8 horas",
+            start_date=timezone.localdate(),
+            end_date=timezone.localdate(),
+        )
+    now = timezone.now()
+    return Reminder.objects.create(
+        patient=patient,
+        created_by=created_by or patient,
+        medication=medication,
+        title=title,
+        start_time=now,
+        frequency="daily",
+        interval_hours=24,
+        next_trigger_time=now,
+    )
+
+
+def create_log(reminder, was_taken, taken_at):
+    log = ReminderLog.objects.create(reminder=reminder, was_taken=was_taken)
+    ReminderLog.objects.filter(pk=log.pk).update(taken_at=taken_at)
+    log.taken_at = taken_at
+    return log
+
+
+def create_doctor(email="doctor@vitalis.local"):
+    doctor = User.objects.create_user(email=email, password="x")
+    DoctorProfile.objects.create(user=doctor, license_number="1", specialty="general")
+    return doctor
+
+
+def local_datetime(day, hour):
+    return timezone.make_aware(datetime.combine(day, time(hour)))
+
+
+# ===============================
+# Adherencia (reminders.adherence)
+# ===============================
+class StreakTests(TestCase):
+    def test_streaks(self):
+        end = date(2026, 1, 10)
+        days = {
+            date(2026, 1, 1): [1, 0],
+            date(2026, 1, 2): [2, 0],
+            date(2026, 1, 3): [1, 1],  # una omitida rompe la racha
+            date(2026, 1, 4): [1, 0],
+            date(2026, 1, 6): [1, 0],  # hueco el día 5
+            date(2026, 1, 7): [1, 0],
+            date(2026, 1, 8): [1, 0],
+            date(2026, 1, 9): [1, 0],
+        }
+        self.assertEqual(_streaks(days, end), (4, 4))
+
+    def test_current_streak_resets_without_recent_logs(self):
+        days = {date(2026, 1, 1): [1, 0], date(2026, 1, 2): [1, 0]}
+        self.assertEqual(_streaks(days, date(2026, 1, 5)), (0, 2))
+        self.assertEqual(_streaks({}, date(2026, 1, 5)), (0, 0))
+
+
+class AdherenceEndpointTests(TestCase):
+    url = "/api/reminders/doctor/reminder-logs/adherence/"
+
+    def setUp(self):
+        self.patient = User.objects.create_user(email="paciente@vitalis.local", password="x")
+        self.doctor = create_doctor()
+        SharedAccess.objects.create(owner=self.patient, shared_with=self.doctor, role="doctor", status="accepted")
+        self.client = APIClient()
+        self.client.force_authenticate(self.doctor)
+
+    def test_summary(self):
+        today = timezone.localdate()
+        morning = create_reminder(self.patient, title="mañana")
+        night = create_reminder(self.patient, title="noche")
+        for offset in range(3):
+            create_log(morning, True, local_datetime(today - timedelta(days=offset), 8))
+        create_log(night, True, local_datetime(today, 21))
+        create_log(night, False, local_datetime(today - timedelta(days=1), 21))
+        # Fuera del rango pedido
+        create_log(morning, False, local_datetime(today - timedelta(days=40), 8))
+
+        with self.assertNumQueries(4):  # 2 perfiles del doctor, accesos, agregación
+            response = self.client.get(self.url, {"patient": self.patient.pk})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+
+        self.assertEqual(data["overall"], {
+            "taken": 4, "missed": 1, "rate": 0.8, "current_streak": 1, "longest_streak": 1,
+        })
+        by_reminder = {r["title"]: r for r in data["by_reminder"]}
+        self.assertEqual(by_reminder["mañana"]["current_streak"], 3)
+        self.assertEqual(by_reminder["noche"]["rate"], 0.5)
+        self.assertEqual(data["by_hour"], [
+            {"hour": 8, "taken": 3, "missed": 0},
+            {"hour": 21, "taken": 1, "missed": 1},
+        ])
+
+    def test_invalid_parameters(self):
+        for params in (
+            {},
+            {"patient": "abc"},
+            {"patient": self.patient.pk, "from": "2024-13-45"},
+            {"patient": self.patient.pk, "to": "ayer"},
+            {"patient": self.patient.pk, "from": "2026-02-01", "to": "2026-01-01"},
+        ):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get(self.url, params).status_code, 400)
+
+
+# ===============================
+# Resúmenes diarios (reminders.rollup)
+# ===============================
+class RollupTests(TestCase):
+    def setUp(self):
+        self.patient = User.objects.create_user(email="paciente@vitalis.local", password="x")
+        self.reminder = create_reminder(self.patient)
+        self.day = timezone.localdate()
+
+    def counts(self):
+        return DailyAdherence.objects.values_list("taken", "missed").get(reminder=self.reminder, day=self.day)
+
+    def test_apply_never_goes_below_zero(self):
+        rollup._apply(self.patient.pk, self.reminder.pk, self.day, 1, 0)
+        rollup._apply(self.patient.pk, self.reminder.pk, self.day, -3, -1)
+        self.assertEqual(self.counts(), (0, 0))
+
+    def test_discounting_a_missing_row_does_not_create_it(self):
+        rollup._apply(self.patient.pk, self.reminder.pk, self.day, -1, 0)
+        self.assertFalse(DailyAdherence.objects.exists())
+
+    def test_upsert_matches_apply(self):
+        other = create_reminder(self.patient, title="otro")
+        yesterday = self.day - timedelta(days=1)
+        groups = {
+            (self.patient.pk, self.reminder.pk, self.day): [2, 1],  # fila existente
+            (self.patient.pk, self.reminder.pk, yesterday): [1, 0],
+            (self.patient.pk, other.pk, self.day): [0, 3],
+        }
+
+        def run(write):
+            DailyAdherence.objects.all().delete()
+            DailyAdherence.objects.create(patient=self.patient, reminder=self.reminder, day=self.day, taken=1, missed=1)
+            write()
+            return set(DailyAdherence.objects.values_list("patient_id", "reminder_id", "day", "taken", "missed"))
+
+        def upsert():
+            with self.assertNumQueries(1):
+                rollup._upsert(groups)
+
+        upserted = run(upsert)
+        applied = run(lambda: [rollup._apply(*key, *counts) for key, counts in groups.items()])
+        self.assertEqual(upserted, applied)
+        self.assertIn((self.patient.pk, self.reminder.pk, self.day, 3, 2), upserted)
+
+
+class ConfirmBatchTests(TestCase):
+    url = "/api/reminders/patient/reminder-logs/confirm-batch/"
+
+    def setUp(self):
+        self.patient = User.objects.create_user(email="paciente@vitalis.local", password="x")
+        self.client = APIClient()
+        self.client.force_authenticate(self.patient)
+
+    def test_mixed_results(self):
+        own = create_reminder(self.patient, title="propio")
+        shared = create_reminder(User.objects.create_user(email="otro@vitalis.local", password="x"), title="compartido")
+        ReminderAccess.objects.create(reminder=shared, user=self.patient)
+        foreign = create_reminder(User.objects.create_user(email="ajeno@vitalis.local", password="x"), title="ajeno")
+
+        response = self.client.post(self.url, {"confirmations": [
+            {"reminder_id": own.pk, "was_taken": True, "notes": "A tiempo"},
+            {"reminder_id": "abc", "was_taken": True},
+            {"reminder_id": foreign.pk, "was_taken": True},
+            {"reminder_id": 999999, "was_taken": False},
+            {"reminder_id": shared.pk, "was_taken": False},
+            {"reminder_id": own.pk, "was_taken": False},
+        ]}, format="json")
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+
+        self.assertEqual([result["status"] for result in data["results"]], [201, 400, 403, 404, 201, 201])
+        self.assertEqual((data["created"], data["failed"]), (3, 3))
+        self.assertIn("reminder_id", data["results"][1]["errors"])
+        self.assertEqual(ReminderLog.objects.count(), 3)
+        self.assertFalse(ReminderLog.objects.filter(reminder=foreign).exists())
+        self.assertEqual(
+            set(DailyAdherence.objects.values_list("reminder_id", "taken", "missed")),
+            {(own.pk, 1, 1), (shared.pk, 0, 1)},
+        )
+
+    def test_rejects_empty_or_oversized_batches(self):
+        self.assertEqual(self.client.post(self.url, {"confirmations": []}, format="json").status_code, 400)
+        with self.settings(REMINDERS_BULK_CONFIRM_MAX_ITEMS=1):
+            response = self.client.post(self.url, {"confirmations": [
+                {"reminder_id": 1, "was_taken": True}, {"reminder_id": 2, "was_taken": True},
+            ]}, format="json")
+        self.assertEqual(response.status_code, 400)
+
+
+# ===============================
+# Listados (ReminderQuerySet.for_list)
+# ===============================
+class ReminderListQueryTests(TestCase):
+    def setUp(self):
+        self.patient = User.objects.create_user(email="paciente@vitalis.local", password="x")
+        self.doctor = create_doctor()
+        self.relatives = [User.objects.create_user(email=f"familiar{i}@vitalis.local", password="x") for i in range(3)]
+        self.client = APIClient()
+
+    def create_reminders(self, count):
+        for i in range(count):
+            reminder = create_reminder(self.patient, created_by=self.doctor, title=f"recordatorio {i}")
+            for relative in self.relatives:
+                ReminderAccess.objects.create(reminder=reminder, user=relative)
+
+    def assertListQueries(self, user, url, num, results):
+        # Cargado como en la autenticación JWT: perfiles y roles resueltos de antemano
+        self.client.force_authenticate(User.objects.with_access().get(pk=user.pk))
+        with self.assertNumQueries(num):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()["results"]), results)
+
+    def assertQueriesDoNotGrow(self, user, url, num, rows_per_reminder=1):
+        for count in (1, 5):
+            with self.subTest(reminders=count):
+                ReminderAccess.objects.all().delete()
+                Reminder.objects.all().delete()
+                self.create_reminders(count)
+                self.assertListQueries(user, url, num, count * rows_per_reminder)
+
+    def test_patient_list(self):
+        self.assertQueriesDoNotGrow(self.patient, "/api/reminders/patient/reminders/", 3)
+
+    def test_shared_list(self):
+        self.assertQueriesDoNotGrow(self.relatives[0], "/api/reminders/patient/reminders/", 3)
+
+    def test_doctor_list(self):
+        self.assertQueriesDoNotGrow(self.doctor, "/api/reminders/doctor/reminders/", 3)
+
+    def test_access_list(self):
+        self.assertQueriesDoNotGrow(self.patient, "/api/reminders/reminder-access/", 2, len(self.relatives))
+
+
+# ===============================
+# Timer de recordatorios (reminders.timer)
+# ===============================
+class ReminderTimerTests(TestCase):
+    def test_lookahead_is_capped_without_notify(self):
+        timer = ReminderTimer(lambda: None, lookahead_seconds=60, listen=False)
+        self.assertEqual(timer.lookahead, timedelta(seconds=FALLBACK_LOOKAHEAD_SECONDS))
+        self.assertEqual(ReminderTimer(lambda: None, lookahead_seconds=60, listen=True).lookahead,
+                         timedelta(seconds=60))
+
+    def test_notifications_schedule_and_cancel(self):
+        timer = ReminderTimer(lambda: None, lookahead_seconds=60, listen=True)
+        timer.refill()
+        trigger_time = timezone.now() + timedelta(seconds=10)
+
+        timer.handle_notification(f"7 {trigger_time.isoformat()}")
+        self.assertEqual(timer._scheduled, {7: trigger_time})
+        timer.handle_notification("7 ")
+        self.assertEqual(timer._scheduled, {})
+
+    def test_refill_keeps_changes_received_during_the_query(self):
+        patient = User.objects.create_user(email="paciente@vitalis.local", password="x")
+        reminder = create_reminder(patient)
+        timer = ReminderTimer(lambda: None, lookahead_seconds=60, listen=True)
+        moved_to = timezone.now() + timedelta(seconds=30)
+
+        # Un aviso que llega mientras el relleno consulta la base de datos
+        original_filter = Reminder.objects.filter
+
+        def filter_and_notify(*args, **kwargs):
+            timer.handle_notification(f"{reminder.pk} {moved_to.isoformat()}")
+            return original_filter(*args, **kwargs)
+
+        with mock.patch.object(Reminder.objects, "filter", side_effect=filter_and_notify):
+            timer.refill()
+        self.assertEqual(timer._scheduled, {reminder.pk: moved_to})
+
+    def test_sharded_timer_only_schedules_its_reminders(self):
+        patient = User.objects.create_user(email="paciente@vitalis.local", password="x")
+        reminders = [create_reminder(patient) for _ in range(4)]
+        Reminder.objects.update(next_trigger_time=timezone.now() + timedelta(seconds=10))
+        timer = ReminderTimer(lambda: None, lookahead_seconds=60, listen=True, shard=(0, 2))
+
+        timer.refill()
+        self.assertEqual(set(timer._scheduled), {r.pk for r in reminders if r.pk % 2 == 0})
+
+        odd_id = next(r.pk for r in reminders if r.pk % 2 == 1)
+        timer.handle_notification(f"{odd_id} {timezone.now().isoformat()}")
+        self.assertNotIn(odd_id, timer._scheduled)
+
+    def test_notify_change_only_in_timer_mode(self):
+        trigger_time = timezone.now() + timedelta(seconds=10)
+        with mock.patch("reminders.timer.supports_notify", return_value=True):
+            with override_settings(REMINDERS_SCHEDULER_MODE="interval"):
+                with self.captureOnCommitCallbacks() as callbacks:
+                    notify_change(7, trigger_time)
+                self.assertEqual(callbacks, [])
+            with override_settings(REMINDERS_SCHEDULER_MODE="timer"):
+                with self.captureOnCommitCallbacks() as callbacks:
+                    notify_change(7, trigger_time)
+                self.assertEqual(len(callbacks), 1)
+
+
+# ===============================
+# Envío de notificaciones (reminders.scheduler)
+# ===============================
+class ResolveRegistrationTokensTests(TestCase):
+    def test_two_queries_for_any_batch(self):
+        users = [User.objects.create_user(email=f"usuario{i}@vitalis.local", password="x") for i in range(6)]
+        for i, user in enumerate(users):
+            CustomFCMDevice.objects.create(user=user, registration_id=f"token-{i}", active=True)
+        CustomFCMDevice.objects.create(user=users[0], registration_id="inactivo", active=False)
+
+        reminders = [create_reminder(users[i], created_by=users[i + 1]) for i in range(3)]
+        ReminderAccess.objects.create(reminder=reminders[0], user=users[4])
+        ReminderAccess.objects.create(reminder=reminders[1], user=users[5], receive_notifications=False)
+        ReminderAccess.objects.create(reminder=reminders[2], user=users[5])
+
+        with self.assertNumQueries(2):
+            tokens = resolve_registration_tokens(reminders)
+
+        self.assertEqual(
+            {reminder_id: sorted(values) for reminder_id, values in tokens.items()},
+            {
+                reminders[0].pk: ["token-0", "token-1", "token-4"],
+                reminders[1].pk: ["token-1", "token-2"],
+                reminders[2].pk: ["token-2", "token-3", "token-5"],
+            },
+        )
+        with self.assertNumQueries(0):
+            self.assertEqual(resolve_registration_tokens([]), {})
+
+
+class AdvanceRemindersTests(TestCase):
+    def setUp(self):
+        self.patient = User.objects.create_user(email="paciente@vitalis.local", password="x")
+        self.due = timezone.now() - timedelta(minutes=1)
+        self.on_time = create_reminder(self.patient, title="a tiempo")
+        self.late = create_reminder(self.patient, title="atrasado")
+        self.once = create_reminder(self.patient, title="una vez")
+        Reminder.objects.update(next_trigger_time=self.due)
+        Reminder.objects.filter(pk=self.late.pk).update(next_trigger_time=self.due - timedelta(days=3))
+        Reminder.objects.filter(pk=self.once.pk).update(frequency="once")
+
+    def test_advances_and_releases_own_leases(self):
+        reminders = claim_due_reminders("worker-a")
+        self.assertEqual(advance_reminders(reminders, "worker-a"), 3)
+
+        rows = {r.pk: r for r in Reminder.objects.all()}
+        self.assertEqual(rows[self.on_time.pk].next_trigger_time, self.due + timedelta(days=1))
+        self.assertGreater(rows[self.late.pk].next_trigger_time, timezone.now())
+        self.assertFalse(rows[self.once.pk].is_active)
+        self.assertTrue(all(r.lease_owner is None for r in rows.values()))
+
+    def test_skips_rows_claimed_by_another_worker(self):
+        reminders = claim_due_reminders("worker-a")
+        # El lease de worker-a expiró y worker-b reclamó los reminders
+        Reminder.objects.update(lease_owner="worker-b")
+
+        self.assertEqual(advance_reminders(reminders, "worker-a"), 0)
+        for reminder in Reminder.objects.all():
+            self.assertEqual(reminder.lease_owner, "worker-b")
+            self.assertTrue(reminder.is_active)
+            self.assertLess(reminder.next_trigger_time, timezone.now())
+
+
+class ProcessRemindersTests(TestCase):
+    def setUp(self):
+        patient = User.objects.create_user(email="paciente@vitalis.local", password="x")
+        medication = create_reminder(patient).medication
+        for i in range(4):
+            create_reminder(patient, title=f"recordatorio {i}", medication=medication)
+        Reminder.objects.update(next_trigger_time=timezone.now() - timedelta(minutes=1))
+
+    def test_drains_every_due_batch_in_one_tick(self):
+        self.assertEqual(process_reminders(worker_id="worker-a", batch_size=2), 5)
+        self.assertEqual(NotificationOutbox.objects.count(), 5)
+        self.assertFalse(Reminder.objects.filter(next_trigger_time__lte=timezone.now()).exists())
+
+    def test_stops_when_the_budget_runs_out(self):
+        self.assertEqual(process_reminders(worker_id="worker-a", batch_size=2, budget=1e-9), 2)
+        self.assertEqual(NotificationOutbox.objects.count(), 2)
+
+
+class RecurrenceTests(SimpleTestCase):
+    start = datetime(2026, 1, 5, 8, tzinfo=dt_timezone.utc)
+
+    def test_get_step(self):
+        self.assertEqual(get_step("daily"), timedelta(days=1))
+        self.assertEqual(get_step("weekly", 8), timedelta(weeks=1))
+        self.assertEqual(get_step("custom", 8), timedelta(hours=8))
+        self.assertIsNone(get_step("custom"))
+        self.assertIsNone(get_step("once", 24))
+
+    def test_first_occurrence(self):
+        now = self.start + timedelta(days=10, hours=1)
+        self.assertEqual(first_occurrence(now + timedelta(hours=1), "daily", now=now), now + timedelta(hours=1))
+        self.assertEqual(first_occurrence(self.start, "weekly", now=now), self.start + timedelta(weeks=2))
+        self.assertEqual(first_occurrence(self.start, "once", now=now), self.start)
+
+    def test_weekly_advancement(self):
+        now = self.start + timedelta(hours=1)
+        self.assertEqual(next_occurrence(self.start, "weekly", now=now), self.start + timedelta(weeks=1))
+        # Un anchor todavía futuro avanza un intervalo
+        self.assertEqual(next_occurrence(self.start, "weekly", now=self.start - timedelta(days=1)),
+                         self.start + timedelta(weeks=1))
+
+    def test_missed_triggers(self):
+        now = self.start + timedelta(hours=20)
+        # Coalescidos: el siguiente disparo estrictamente futuro
+        self.assertEqual(next_occurrence(self.start, "custom", 8, now=now, coalesce=True),
+                         self.start + timedelta(hours=24))
+        self.assertEqual(next_occurrence(self.start, "custom", 8, now=self.start + timedelta(hours=16), coalesce=True),
+                         self.start + timedelta(hours=24))
+        # Sin coalescer: cada disparo perdido se envía
+        self.assertEqual(next_occurrence(self.start, "custom", 8, now=now, coalesce=False),
+                         self.start + timedelta(hours=8))
+        self.assertIsNone(next_occurrence(self.start, "once", now=now))
+
+    def test_dst_change_never_returns_a_past_time(self):
+        # 8:00 CST del día anterior al cambio de horario en Chicago (8 de marzo de 2026)
+        anchor = datetime(2026, 3, 7, 8, tzinfo=ZoneInfo("America/Chicago"))
+        now = datetime(2026, 3, 8, 13, 30, tzinfo=dt_timezone.utc)  # 8:30 CDT
+
+        following = next_occurrence(anchor, "daily", now=now, coalesce=True)
+        self.assertGreater(following, now)
+        self.assertEqual(following, anchor.astimezone(dt_timezone.utc) + timedelta(hours=24))
+        self.assertEqual(next_occurrence(anchor, "daily", coalesce=False) - anchor, timedelta(hours=24))
+
+    def test_naive_start_uses_the_current_timezone(self):
+        now = timezone.now()
+        start = timezone.make_naive(now + timedelta(hours=2))
+        self.assertEqual(first_occurrence(start, "daily", now=now), now + timedelta(hours=2))
+        self.assertEqual(first_occurrence(start - timedelta(days=1, hours=3), "daily", now=now),
+                         now + timedelta(hours=23))
+
+
+class PurgeOutboxTests(TestCase):
+    def test_purges_old_finished_entries_in_batches(self):
+        reminder = create_reminder(User.objects.create_user(email="paciente@vitalis.local", password="x"))
+        now = timezone.now()
+        kept = []
+        entries = ((30, "sent"), (30, "failed"), (10, "sent"), (30, "pending"), (1, "sent"))
+        for minutes, (days, status) in enumerate(entries):
+            entry = NotificationOutbox.objects.create(
+                reminder=reminder, scheduled_for=now - timedelta(days=days, minutes=minutes), status=status
+            )
+            NotificationOutbox.objects.filter(pk=entry.pk).update(created_at=now - timedelta(days=days))
+            if status == "pending" or days < 7:
+                kept.append(entry.pk)
+
+        with self.settings(REMINDERS_OUTBOX_RETENTION_DAYS=7):
+            self.assertEqual(purge_outbox(batch_size=2), 3)
+        self.assertEqual(sorted(NotificationOutbox.objects.values_list("pk", flat=True)), kept)
+
+
+class FakeCredential:
+    """Credencial OAuth de prueba: cada refresh entrega un token nuevo."""
+
+    def __init__(self):
+        self.refreshes = 0
+        self.token = None
+        self.valid = False
+        self.lock = threading.Lock()
+
+    def refresh(self, request):
+        with self.lock:
+            self.refreshes += 1
+            self.token = f"token-{self.refreshes}"
+            self.valid = True
+
+
+class AsyncFCMDispatcherTests(SimpleTestCase):
+    def dispatcher(self, handler):
+        self.credential = FakeCredential()
+        self.requests = []
+
+        def record(request):
+            self.requests.append(request)
+            return handler(request)
+
+        dispatcher = AsyncFCMDispatcher(
+            project_id="vitalis",
+            credential=self.credential,
+            base_url="https://fcm.test",
+            concurrency=4,
+            transport=httpx.MockTransport(record),
+        )
+        self.addCleanup(dispatcher.close)
+        return dispatcher
+
+    @staticmethod
+    def messages(count):
+        return [messaging.Message(token=f"device-{i}", data={"reminder_id": str(i)}) for i in range(count)]
+
+    @staticmethod
+    def fcm_error(status_code, status, error_code=None):
+        details = [{"@type": "type.googleapis.com/google.firebase.fcm.v1.FcmError", "errorCode": error_code}]
+        return httpx.Response(status_code, json={"error": {
+            "code": status_code, "message": status, "status": status, "details": details if error_code else [],
+        }})
+
+    def test_sends_each_message_with_a_shared_token(self):
+        def handler(request):
+            token = json.loads(request.content)["message"]["token"]
+            return httpx.Response(200, json={"name": f"projects/vitalis/messages/{token}"})
+
+        responses = self.dispatcher(handler).send_each(self.messages(10))
+
+        self.assertEqual([r.message_id for r in responses], [f"projects/vitalis/messages/device-{i}" for i in range(10)])
+        self.assertEqual(self.credential.refreshes, 1)
+        request = self.requests[0]
+        self.assertEqual(str(request.url), "https://fcm.test/v1/projects/vitalis/messages:send")
+        self.assertEqual(request.headers["Authorization"], "Bearer token-1")
+
+    def test_concurrency_is_shared_by_concurrent_callers(self):
+        in_flight = []
+        peak = []
+
+        async def handler(request):
+            in_flight.append(request)
+            peak.append(len(in_flight))
+            await asyncio.sleep(0.01)
+            in_flight.remove(request)
+            return httpx.Response(200, json={"name": "projects/vitalis/messages/ok"})
+
+        dispatcher = self.dispatcher(handler)
+        # Como los dispatchers del outbox: varios hilos con el mismo dispatcher
+        threads = [threading.Thread(target=dispatcher.send_each, args=(self.messages(8),)) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(self.requests), 24)
+        self.assertEqual(max(peak), 4)
+
+    def test_maps_fcm_errors_per_message(self):
+        def handler(request):
+            token = json.loads(request.content)["message"]["token"]
+            if token == "device-1":
+                return self.fcm_error(404, "NOT_FOUND", "UNREGISTERED")
+            if token == "device-2":
+                return self.fcm_error(500, "INTERNAL")
+            if token == "device-3":
+                raise httpx.ConnectError("sin conexión", request=request)
+            return httpx.Response(200, json={"name": "projects/vitalis/messages/ok"})
+
+        responses = self.dispatcher(handler).send_each(self.messages(4))
+
+        self.assertTrue(responses[0].success)
+        self.assertIsInstance(responses[1].exception, messaging.UnregisteredError)
+        self.assertIsInstance(responses[2].exception, exceptions.InternalError)
+        self.assertIsInstance(responses[3].exception, exceptions.UnavailableError)
+
+    def test_retries_once_with_a_refreshed_token(self):
+        def handler(request):
+            if request.headers["Authorization"] == "Bearer token-1":
+                return self.fcm_error(401, "UNAUTHENTICATED")
+            return httpx.Response(200, json={"name": "projects/vitalis/messages/ok"})
+
+        # Tantos mensajes como la concurrencia: todos salen con el primer token
+        responses = self.dispatcher(handler).send_each(self.messages(4))
+
+        self.assertTrue(all(response.success for response in responses))
+        # Un solo refresh para todas las peticiones rechazadas
+        self.assertEqual(self.credential.refreshes, 2)
+        self.assertEqual(len(self.requests), 8)
+
+    def test_gives_up_after_a_second_401(self):
+        responses = self.dispatcher(lambda request: self.fcm_error(401, "UNAUTHENTICATED")).send_each(self.messages(1))
+
+        self.assertIsInstance(responses[0].exception, exceptions.UnauthenticatedError)
+        self.assertEqual(len(self.requests), 2)
+
+
+# ===============================
+# Sincronización (reminders.sync)
+# ===============================
+class SyncTests(TestCase):
+    url = "/api/reminders/sync/"
+
+    def setUp(self):
+        self.patient = User.objects.create_user(email="paciente@vitalis.local", password="x")
+        self.relative = User.objects.create_user(email="familiar@vitalis.local", password="x")
+        self.client = APIClient()
+        self.client.force_authenticate(self.patient)
+
+    def sync(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def tombstones(self, user, kind):
+        return set(SyncTombstone.objects.filter(user=user, kind=kind).values_list("object_id", flat=True))
+
+    def test_delta_repeats_the_overlap_window(self):
+        old = create_reminder(self.patient, title="viejo")
+        recent = create_reminder(self.patient, title="reciente")
+        token = self.sync()["token"]
+        since = timezone.datetime.fromisoformat(token)
+        Reminder.objects.filter(pk=old.pk).update(updated_at=since - timedelta(hours=1))
+        Reminder.objects.filter(pk=recent.pk).update(updated_at=since - timedelta(seconds=30))
+        Medication.objects.update(updated_at=since - timedelta(hours=1))
+
+        data = self.sync(since=token)
+        self.assertFalse(data["full"])
+        self.assertEqual([r["id"] for r in data["reminders"]], [recent.pk])
+        self.assertEqual(data["medications"], [])
+
+    def test_access_changes_resend_the_reminder(self):
+        reminder = create_reminder(self.patient)
+        since = (timezone.now() - timedelta(minutes=10)).isoformat()
+        steps = (
+            (self.patient, lambda: None, []),
+            (self.patient, lambda: ReminderAccess.objects.create(reminder=reminder, user=self.relative), [reminder.pk]),
+            (self.relative, lambda: ReminderAccess.objects.get(user=self.relative).save(), [reminder.pk]),
+            (self.patient, lambda: ReminderAccess.objects.filter(user=self.relative).delete(), [reminder.pk]),
+        )
+        for user, change, expected in steps:
+            Reminder.objects.update(updated_at=timezone.now() - timedelta(days=1))
+            change()
+            self.client.force_authenticate(user)
+            self.assertEqual([r["id"] for r in self.sync(since=since)["reminders"]], expected)
+
+    def test_invalid_or_expired_token(self):
+        self.assertEqual(self.client.get(self.url, {"since": "ayer"}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {"cursor": "no-es-un-cursor"}).status_code, 400)
+        expired = timezone.now() - timedelta(days=60)
+        self.assertTrue(self.sync(since=expired.isoformat())["full"])
+
+    def test_deleted_and_revoked_reminders(self):
+        reminder = create_reminder(self.patient)
+        access = ReminderAccess.objects.create(reminder=reminder, user=self.relative)
+        token = self.sync()["token"]
+
+        reminder_id = reminder.pk
+        access.delete()
+        self.assertEqual(self.tombstones(self.relative, "reminder"), {reminder_id})
+        reminder.delete()
+        self.assertEqual(self.sync(since=token)["deleted"]["reminder"], [reminder_id])
+
+    def test_medication_tombstones_reach_shared_users(self):
+        reminder = create_reminder(self.patient)
+        ReminderAccess.objects.create(reminder=reminder, user=self.relative)
+
+        reminder.medication.delete()
+        self.assertEqual(self.tombstones(self.patient, "medication"), {reminder.medication_id})
+        self.assertEqual(self.tombstones(self.relative, "medication"), {reminder.medication_id})
+
+    def test_log_tombstones_are_batched(self):
+        reminders = [create_reminder(self.patient, title=f"recordatorio {i}") for i in range(2)]
+        for reminder in reminders:
+            ReminderAccess.objects.create(reminder=reminder, user=self.relative)
+        logs = [create_log(reminder, True, timezone.now()) for reminder in reminders for _ in range(3)]
+
+        # Recolección, borrado, recordatorios, accesos e INSERT, sin importar cuántos logs
+        with self.assertNumQueries(5):
+            ReminderLog.objects.filter(reminder__in=reminders).delete()
+        expected = {log.pk for log in logs}
+        self.assertEqual(self.tombstones(self.patient, "reminder_log"), expected)
+        self.assertEqual(self.tombstones(self.relative, "reminder_log"), expected)
+
+        # Borrar el recordatorio no deja tombstones de sus logs
+        create_log(reminders[0], True, timezone.now())
+        SyncTombstone.objects.all().delete()
+        reminders[0].delete()
+        self.assertEqual(self.tombstones(self.patient, "reminder_log"), set())
+
+    @override_settings(SYNC_PAGE_SIZE=2)
+    def test_full_sync_is_paged(self):
+        reminders = [create_reminder(self.patient, title=f"recordatorio {i}") for i in range(3)]
+
+        first = self.sync()
+        self.assertEqual([r["id"] for r in first["reminders"]], [r.pk for r in reminders[:2]])
+        self.assertIsNotNone(first["next"])
+
+        second = self.sync(cursor=first["next"])
+        self.assertEqual([r["id"] for r in second["reminders"]], [reminders[2].pk])
+        self.assertEqual(len(first["medications"]) + len(second["medications"]), 3)
+        self.assertIsNone(second["next"])
+        self.assertEqual((second["token"], second["full"]), (first["token"], True))
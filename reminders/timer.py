@@ -0,0 +1,293 @@
+import heapq
+import logging
+import select
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from reminders.models import Reminder
+from reminders.sharding import filter_shard, in_shard
+
+logger = logging.getLogger()
+
+# Timer activo en este proceso (None si el scheduler corre en modo "interval")
+active_timer = None
+
+# Canal de Postgres por el que los procesos web avisan al worker de cambios en Reminder
+NOTIFY_CHANNEL = "reminders_timer"
+
+# Sin LISTEN/NOTIFY la ventana no pasa del antiguo intervalo de consulta
+FALLBACK_LOOKAHEAD_SECONDS = 5
+
+
+def supports_notify():
+    return connection.vendor == "postgresql"
+
+
+def notify_change(reminder_id, trigger_time):
+    """
+    Avisa a los workers de otros procesos que el disparo de un reminder cambió
+    (trigger_time=None para cancelarlo). Se envía al confirmar la transacción;
+    solo con Postgres (pg_notify) y en modo "timer": en modo "interval" nadie
+    escucha el canal.
+    """
+    if settings.REMINDERS_SCHEDULER_MODE != "timer" or not supports_notify():
+        return
+    payload = f"{reminder_id} {trigger_time.isoformat() if trigger_time else ''}"
+
+    def send():
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_notify(%s, %s)", [NOTIFY_CHANNEL, payload])
+
+    transaction.on_commit(send)
+
+
+class ReminderTimer:
+    """
+    Scheduler por eventos para los recordatorios.
+
+    Mantiene un min-heap con los próximos next_trigger_time dentro de una
+    ventana (look-ahead) y duerme exactamente hasta el siguiente disparo, en
+    lugar de consultar la tabla completa cada 5 segundos. La ventana se
+    rellena con una consulta por rango al expirar, y las señales post_save /
+    post_delete de Reminder insertan, mueven o cancelan entradas al momento.
+
+    Los procesos web no tienen timer: en Postgres avisan de cada cambio con
+    pg_notify (notify_change) y un hilo del worker los recibe con LISTEN, así
+    que un reminder creado por la API dentro de la ventana se agenda al
+    momento. En otros backends la ventana se limita a
+    FALLBACK_LOOKAHEAD_SECONDS y los cambios se ven en el siguiente relleno.
+    El disparo en sí lo resuelve on_fire (process_reminders), que sigue
+    reclamando las filas en la base de datos.
+    """
+
+    # Espera antes de reintentar un reminder que sigue vencido tras disparar
+    # (p. ej. reclamado por otro worker que aún no lo avanza).
+    RETRY_DELAY = timezone.timedelta(seconds=1)
+
+    # Cada cuánto revisa el hilo de LISTEN si el timer se detuvo
+    LISTEN_POLL_SECONDS = 1
+
+    def __init__(self, on_fire, lookahead_seconds=None, listen=None, shard=None):
+        self.on_fire = on_fire
+        self.shard = shard     # (shard_id, total_shards): solo agenda los reminders de su shard
+        self.listen = supports_notify() if listen is None else listen
+        lookahead_seconds = lookahead_seconds or settings.REMINDERS_TIMER_LOOKAHEAD_SECONDS
+        if not self.listen:
+            lookahead_seconds = min(lookahead_seconds, FALLBACK_LOOKAHEAD_SECONDS)
+        self.lookahead = timezone.timedelta(seconds=lookahead_seconds)
+        self._heap = []        # (trigger_time, reminder_id)
+        self._scheduled = {}   # reminder_id -> trigger_time vigente
+        self._condition = threading.Condition()
+        self._window_end = None
+        self._stopped = False
+        self._thread = None
+        self._listen_thread = None
+        self._pending = None   # cambios recibidos durante un relleno (reminder_id -> trigger_time)
+
+    # -------------------------------
+    # Manejo de entradas
+    # -------------------------------
+    def schedule(self, reminder_id, trigger_time):
+        """Inserta o mueve el disparo de un reminder."""
+        if not in_shard(reminder_id, self.shard):
+            return  # lo agenda el worker de su shard
+        with self._condition:
+            if self._pending is not None:
+                self._pending[reminder_id] = trigger_time
+            if trigger_time is None or (self._window_end and trigger_time > self._window_end):
+                # Fuera de la ventana: lo recogerá el siguiente relleno
+                self._scheduled.pop(reminder_id, None)
+                return
+
+            # Las entradas viejas del heap se descartan al salir (borrado perezoso)
+            self._scheduled[reminder_id] = trigger_time
+            heapq.heappush(self._heap, (trigger_time, reminder_id))
+            self._condition.notify()
+
+    def cancel(self, reminder_id):
+        """Cancela el disparo pendiente de un reminder."""
+        with self._condition:
+            if self._pending is not None:
+                self._pending[reminder_id] = None
+            self._scheduled.pop(reminder_id, None)
+            self._condition.notify()
+
+    def refill(self):
+        """Carga los disparos de la siguiente ventana con una consulta por rango."""
+        window_end = timezone.now() + self.lookahead
+        with self._condition:
+            self._pending = {}
+        try:
+            upcoming = dict(
+                filter_shard(
+                    Reminder.objects.filter(is_active=True, next_trigger_time__lte=window_end), "id", self.shard
+                ).values_list("id", "next_trigger_time")
+            )
+        except Exception:
+            with self._condition:
+                self._pending = None
+            raise
+
+        with self._condition:
+            # Los avisos llegados durante la consulta pueden ser más nuevos que lo leído
+            for reminder_id, trigger_time in self._pending.items():
+                if trigger_time is None or trigger_time > window_end:
+                    upcoming.pop(reminder_id, None)
+                else:
+                    upcoming[reminder_id] = trigger_time
+            self._pending = None
+            self._scheduled = upcoming
+            self._heap = [(trigger_time, reminder_id) for reminder_id, trigger_time in upcoming.items()]
+            heapq.heapify(self._heap)
+            self._window_end = window_end
+
+        logger.info(f"Timer de recordatorios: {len(upcoming)} disparos en la ventana hasta {window_end}")
+
+    def _is_current(self, entry):
+        trigger_time, reminder_id = entry
+        return self._scheduled.get(reminder_id) == trigger_time
+
+    def _peek(self):
+        while self._heap and not self._is_current(self._heap[0]):
+            heapq.heappop(self._heap)
+        return self._heap[0][0] if self._heap else None
+
+    def _pop_due(self, now):
+        due_ids = []
+        while self._heap and self._heap[0][0] <= now:
+            entry = heapq.heappop(self._heap)
+            if self._is_current(entry):
+                del self._scheduled[entry[1]]
+                due_ids.append(entry[1])
+        return due_ids
+
+    # -------------------------------
+    # Ciclo principal
+    # -------------------------------
+    def _fire(self, due_ids):
+        try:
+            self.on_fire()
+
+            # process_reminders avanza los reminders con UPDATE (sin señales),
+            # así que se vuelve a leer su siguiente disparo.
+            retry_at = timezone.now() + self.RETRY_DELAY
+            upcoming = Reminder.objects.filter(id__in=due_ids, is_active=True).values_list(
+                "id", "next_trigger_time"
+            )
+            for reminder_id, trigger_time in upcoming:
+                if trigger_time is not None:
+                    self.schedule(reminder_id, max(trigger_time, retry_at))
+        except Exception:
+            logger.exception("Error procesando disparos del timer de recordatorios")
+        finally:
+            close_old_connections()
+
+    def run(self):
+        while True:
+            with self._condition:
+                if self._stopped:
+                    return
+
+                now = timezone.now()
+                due_ids = self._pop_due(now)
+                needs_refill = not due_ids and (self._window_end is None or now >= self._window_end)
+
+                if not due_ids and not needs_refill:
+                    wakeup = min(self._peek() or self._window_end, self._window_end)
+                    self._condition.wait(timeout=(wakeup - now).total_seconds())
+                    continue
+
+            if due_ids:
+                self._fire(due_ids)
+            else:
+                try:
+                    self.refill()
+                except Exception:
+                    logger.exception("Error rellenando la ventana del timer de recordatorios")
+                    with self._condition:
+                        self._condition.wait(timeout=self.lookahead.total_seconds())
+                finally:
+                    close_old_connections()
+
+    # -------------------------------
+    # Avisos de otros procesos (LISTEN/NOTIFY)
+    # -------------------------------
+    def handle_notification(self, payload):
+        """Aplica un aviso de notify_change: "<id> <iso>" o "<id> " para cancelar."""
+        reminder_id, _, trigger_time = payload.partition(" ")
+        trigger_time = parse_datetime(trigger_time) if trigger_time else None
+        if trigger_time is None:
+            self.cancel(int(reminder_id))
+        else:
+            self.schedule(int(reminder_id), trigger_time)
+
+    def listen_loop(self):
+        """
+        Escucha NOTIFY_CHANNEL con la conexión de este hilo (psycopg2) hasta que
+        el timer se detenga. Si la conexión falla, reintenta y rellena la
+        ventana para no perder los avisos enviados mientras tanto.
+        """
+        while not self._stopped:
+            try:
+                connection.ensure_connection()
+                with connection.cursor() as cursor:
+                    cursor.execute(f"LISTEN {NOTIFY_CHANNEL}")
+                pg_connection = connection.connection
+                while not self._stopped:
+                    if select.select([pg_connection], [], [], self.LISTEN_POLL_SECONDS) == ([], [], []):
+                        continue
+                    pg_connection.poll()
+                    while pg_connection.notifies:
+                        self.handle_notification(pg_connection.notifies.pop(0).payload)
+            except Exception:
+                logger.exception("Error escuchando avisos del timer de recordatorios")
+                connection.close()
+                with self._condition:
+                    self._window_end = None  # fuerza un relleno
+                    self._condition.notify()
+                    self._condition.wait(timeout=self.LISTEN_POLL_SECONDS)
+        connection.close()
+
+    def start(self):
+        self._thread = threading.Thread(target=self.run, name="reminder-timer", daemon=True)
+        self._thread.start()
+        if self.listen:
+            self._listen_thread = threading.Thread(
+                target=self.listen_loop, name="reminder-timer-listen", daemon=True
+            )
+            self._listen_thread.start()
+
+    def stop(self):
+        """Detiene el ciclo esperando a que termine el disparo en curso."""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+        if self._thread:
+            self._thread.join()
+        if self._listen_thread:
+            self._listen_thread.join()
+
+
+def start_reminder_timer(on_fire, shard=None):
+    """Inicia el timer de recordatorios de este proceso (solo para su shard, si tiene)."""
+    global active_timer
+
+    if active_timer:
+        return active_timer
+
+    active_timer = ReminderTimer(on_fire, shard=shard)
+    active_timer.start()
+    return active_timer
+
+
+def stop_reminder_timer():
+    """Detiene el timer de recordatorios de este proceso, si está activo."""
+    global active_timer
+
+    if active_timer:
+        active_timer.stop()
+        active_timer = None
@@ -6,6 +6,7 @@ from .views import (
     PatientReminderLogViewSet,
     DoctorReminderLogViewSet,
     ReminderAccessViewSet,
+    SyncViewSet,
 )
 
 router = DefaultRouter()
@@ -24,4 +25,7 @@ router.register("patient/reminder-logs", PatientReminderLogViewSet, basename="re
 # Acceso compartido (cuidador ↔ paciente)
 router.register("reminder-access", ReminderAccessViewSet, basename="reminder-access")
 
+# Cambios desde un token de sincronización (apps offline-first)
+router.register("sync", SyncViewSet, basename="sync")
+
 urlpatterns = router.urls
@@ -1,18 +1,27 @@
-from django.db import models
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.dateparse import parse_date
 from rest_framework import viewsets, permissions, status, serializers
 from rest_framework.response import Response
 from rest_framework.decorators import action
 from utils.permissions import IsDoctor
-from shared_access.models import SharedAccess
+from shared_access import access_graph
 from rest_framework.exceptions import PermissionDenied
 
+from . import rollup, sync
+from .adherence import adherence_summary, daily_adherence
 from .models import Reminder, ReminderLog, ReminderAccess
 from .serializers import (
     ReminderSerializer,
     ReminderLogSerializer,
     ReminderAccessSerializer,
+    ReminderConfirmationSerializer,
 )
+from medications.serializers import MedicationSerializer
 from medications.validators import validate_doctor_patient_access
 from django.contrib.auth import get_user_model
 
@@ -29,17 +38,11 @@ class PatientReminderViewSet(viewsets.ModelViewSet):
     """
     serializer_class = ReminderSerializer
     permission_classes = [permissions.IsAuthenticated]
+    cursor_ordering = ("-created_at", "-id")
 
     def get_queryset(self):
         user = self.request.user
-        return (
-            Reminder.objects.filter(
-                models.Q(patient=user) | models.Q(shared_with__user=user)
-            )
-            .distinct()
-            .select_related("patient", "created_by", "medication")
-            .prefetch_related("shared_with__user")
-        )
+        return Reminder.objects.visible_to(user).for_list()
 
     def perform_create(self, serializer):
         """
@@ -55,20 +58,26 @@ class PatientReminderLogViewSet(viewsets.ModelViewSet):
     """
     serializer_class = ReminderLogSerializer
     permission_classes = [permissions.IsAuthenticated]
+    cursor_ordering = ("-taken_at", "-id")
 
     def get_queryset(self):
         user = self.request.user
-        return (
-            ReminderLog.objects.filter(
-                models.Q(reminder__patient=user)
-                | models.Q(reminder__shared_with__user=user)
-            )
-            .distinct()
-            .select_related("reminder", "reminder__medication")
-        )
+        return ReminderLog.objects.visible_to(user).select_related("reminder", "reminder__medication")
 
+    # Cada escritura de logs actualiza DailyAdherence en la misma transacción
+    @transaction.atomic
     def perform_create(self, serializer):
-        serializer.save()
+        rollup.record_log(serializer.save())
+
+    @transaction.atomic
+    def perform_update(self, serializer):
+        rollup.record_log(serializer.instance, sign=-1)
+        rollup.record_log(serializer.save())
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        rollup.record_log(instance, sign=-1)
+        instance.delete()
 
     @action(detail=False, methods=["post"], url_path="confirm")
     def confirm_medication(self, request):
@@ -101,16 +110,89 @@ class PatientReminderLogViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_403_FORBIDDEN,
             )
 
-        # Crear el log de confirmación
-        reminder_log = ReminderLog.objects.create(
-            reminder=reminder,
-            was_taken=was_taken,
-            notes=notes,
-        )
+        # Crear el log de confirmación y sumarlo al resumen diario
+        with transaction.atomic():
+            reminder_log = ReminderLog.objects.create(
+                reminder=reminder,
+                was_taken=was_taken,
+                notes=notes,
+            )
+            rollup.record_log(reminder_log)
 
         serializer = ReminderLogSerializer(reminder_log)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+    @action(detail=False, methods=["post"], url_path="confirm-batch")
+    def confirm_medication_batch(self, request):
+        """
+        Confirma varias tomas en una sola petición (cuidadores con varios
+        pacientes, o apps móviles que vuelven a estar en línea).
+        Ejemplo JSON:
+        {
+            "confirmations": [
+                {"reminder_id": 12, "was_taken": true, "notes": "A tiempo"},
+                {"reminder_id": 15, "was_taken": false}
+            ]
+        }
+        Responde un resultado por elemento, en el mismo orden, con su `status`
+        (201, 400, 403 o 404). Los elementos válidos se guardan aunque otros fallen.
+        """
+        items = request.data.get("confirmations")
+        if not isinstance(items, list) or not items:
+            return Response(
+                {"detail": "El campo 'confirmations' debe ser una lista no vacía."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        max_items = settings.REMINDERS_BULK_CONFIRM_MAX_ITEMS
+        if len(items) > max_items:
+            return Response(
+                {"detail": f"Se permiten como máximo {max_items} confirmaciones por petición."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        results = [None] * len(items)
+        valid = []
+        for index, item in enumerate(items):
+            confirmation = ReminderConfirmationSerializer(data=item)
+            if confirmation.is_valid():
+                valid.append((index, confirmation.validated_data))
+            else:
+                results[index] = {"status": status.HTTP_400_BAD_REQUEST, "errors": confirmation.errors}
+
+        # Una sola query para existencia y acceso de todos los recordatorios del lote
+        reminders = {
+            reminder.pk: reminder
+            for reminder in Reminder.objects.filter(pk__in={data["reminder_id"] for _, data in valid})
+            .with_access_flag(request.user)
+            .only("id", "patient_id")
+        }
+
+        pending = []
+        for index, data in valid:
+            reminder = reminders.get(data["reminder_id"])
+            if reminder is None:
+                results[index] = {"reminder_id": data["reminder_id"], "status": status.HTTP_404_NOT_FOUND,
+                                  "detail": "Recordatorio no encontrado."}
+            elif not reminder.user_has_access:
+                results[index] = {"reminder_id": data["reminder_id"], "status": status.HTTP_403_FORBIDDEN,
+                                  "detail": "No tienes permiso para confirmar este recordatorio."}
+            else:
+                log = ReminderLog(reminder=reminder, was_taken=data["was_taken"], notes=data["notes"] or "")
+                pending.append((index, log))
+
+        with transaction.atomic():
+            logs = ReminderLog.objects.bulk_create([log for _, log in pending])
+            rollup.record_logs(logs)
+
+        for (index, _), log in zip(pending, logs):
+            results[index] = {"reminder_id": log.reminder_id, "status": status.HTTP_201_CREATED,
+                              "id": log.pk, "taken_at": log.taken_at, "was_taken": log.was_taken}
+
+        return Response(
+            {"created": len(logs), "failed": len(items) - len(logs), "results": results},
+            status=status.HTTP_200_OK,
+        )
+
 # ===============================
 # Vistas de doctor
 # ===============================
@@ -121,11 +203,12 @@ class DoctorReminderViewSet(viewsets.ModelViewSet):
     """
     permission_classes = [permissions.IsAuthenticated, IsDoctor]
     serializer_class = ReminderSerializer
+    cursor_ordering = ("-created_at", "-id")
 
     def get_queryset(self):
         doctor = self.request.user
         # El doctor solo ve recordatorios creados por él
-        return Reminder.objects.filter(created_by=doctor)
+        return Reminder.objects.filter(created_by=doctor).for_list()
 
     def _check_doctor_access(self, patient):
         """
@@ -133,14 +216,7 @@ class DoctorReminderViewSet(viewsets.ModelViewSet):
         Lanza excepción si no lo tiene.
         """
         doctor = self.request.user
-        has_access = SharedAccess.objects.filter(
-            owner=patient,
-            shared_with=doctor,
-            role="doctor",
-            status="accepted"
-        ).exists()
-
-        if not has_access:
+        if not access_graph.has_access(doctor, patient, role="doctor"):
             raise PermissionDenied(
                 detail="No tienes un acceso activo con este paciente."
             )
@@ -192,6 +268,7 @@ class DoctorReminderLogViewSet(viewsets.ReadOnlyModelViewSet):
     """
     serializer_class = ReminderLogSerializer
     permission_classes = [permissions.IsAuthenticated,IsDoctor]
+    cursor_ordering = ("-taken_at", "-id")
 
     def get_queryset(self):
         user = self.request.user
@@ -205,6 +282,54 @@ class DoctorReminderLogViewSet(viewsets.ReadOnlyModelViewSet):
             .select_related("reminder", "reminder__medication")
         )
 
+    @action(detail=False, methods=["get"], url_path="adherence")
+    def adherence(self, request):
+        """
+        Estadísticas de adherencia de un paciente calculadas en la base de datos:
+        ?patient=<id>&from=YYYY-MM-DD&to=YYYY-MM-DD (por defecto, los últimos 30 días).
+        Devuelve tasas por medicamento y por recordatorio, rachas y distribución por hora.
+        """
+        patient_id, start, end = self._adherence_params()
+        return Response(adherence_summary(patient_id, start, end), status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=["get"], url_path="adherence/daily")
+    def adherence_daily(self, request):
+        """
+        Serie diaria de adherencia leída del resumen DailyAdherence (O(días)),
+        con los mismos parámetros que `adherence`.
+        """
+        patient_id, start, end = self._adherence_params()
+        return Response(daily_adherence(patient_id, start, end), status=status.HTTP_200_OK)
+
+    def _adherence_params(self):
+        patient_id = self.request.query_params.get("patient")
+        if not patient_id:
+            raise serializers.ValidationError({"patient": "Este parámetro es obligatorio."})
+        try:
+            patient_id = int(patient_id)
+        except ValueError:
+            raise serializers.ValidationError({"patient": "Debe ser un id numérico."})
+        validate_doctor_patient_access(self.request.user, patient_id)
+
+        end = self._parse_date("to", timezone.localdate())
+        start = self._parse_date("from", end - timedelta(days=29))
+        if start > end:
+            raise serializers.ValidationError({"from": "Debe ser anterior o igual a 'to'."})
+        return patient_id, start, end
+
+    def _parse_date(self, param, default):
+        value = self.request.query_params.get(param)
+        if not value:
+            return default
+        try:
+            # parse_date lanza ValueError con fechas bien formadas pero inexistentes (2024-13-45)
+            parsed = parse_date(value)
+        except ValueError:
+            parsed = None
+        if parsed is None:
+            raise serializers.ValidationError({param: "Formato de fecha inválido, use YYYY-MM-DD."})
+        return parsed
+
 
 # ===============================
 # Vista de compartir acceso
@@ -216,16 +341,15 @@ class ReminderAccessViewSet(viewsets.ModelViewSet):
     """
     serializer_class = ReminderAccessSerializer
     permission_classes = [permissions.IsAuthenticated]
+    cursor_ordering = ("-added_at", "-id")
 
     def get_queryset(self):
         user = self.request.user
         # Mostrar accesos de recordatorios donde el usuario es paciente o creador
         return (
-            ReminderAccess.objects.filter(
-                models.Q(reminder__patient=user) | models.Q(reminder__created_by=user)
-            )
+            ReminderAccess.objects.managed_by(user)
             .select_related("reminder", "user")
-            .distinct()
+            .prefetch_related("user__roles")
         )
 
     def perform_create(self, serializer):
@@ -285,3 +409,45 @@ class ReminderAccessViewSet(viewsets.ModelViewSet):
 
         access.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+# ===============================
+# Sincronización incremental (apps móviles offline-first)
+# ===============================
+class SyncViewSet(viewsets.ViewSet):
+    """
+    GET /sync/?since=<token>: recordatorios, medicamentos y logs visibles que
+    cambiaron desde el token, más los ids borrados (ver reminders.sync).
+    Sin `since` devuelve todo. La respuesta trae el `token` para la siguiente llamada
+    y, si hay más páginas, `next` para pedirlas con ?cursor=<next>.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def list(self, request):
+        since = request.query_params.get("since")
+        if since:
+            try:
+                since = sync.parse_token(since)
+            except ValueError:
+                raise serializers.ValidationError({"since": "Token de sincronización inválido."})
+
+        try:
+            changes = sync.changes_since(request.user, since or None, request.query_params.get("cursor") or None)
+        except ValueError:
+            raise serializers.ValidationError({"cursor": "Cursor de sincronización inválido."})
+        context = self.get_serializer_context()
+        return Response(
+            {
+                "token": changes["token"],
+                "full": changes["full"],
+                "next": changes["next"],
+                "reminders": ReminderSerializer(changes["reminders"], many=True, context=context).data,
+                "medications": MedicationSerializer(changes["medications"], many=True, context=context).data,
+                "logs": ReminderLogSerializer(changes["logs"], many=True, context=context).data,
+                "deleted": changes["deleted"],
+            },
+            status=status.HTTP_200_OK,
+        )
+
+    def get_serializer_context(self):
+        return {"request": self.request, "view": self}
@@ -0,0 +1,85 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import models
+
+from .models import SharedAccess
+
+CACHE_KEY = "shared_access:edges:{}"
+ROLES = [role for role, _ in SharedAccess.ROLE_CHOICES]
+
+# Sube con cada invalidate() de este proceso; descarta los memos de usuario anteriores
+_generation = 0
+
+
+def _user_id(user):
+    """
+    Id del usuario (instancia o id), o None si no hay usuario o el id no es válido.
+    """
+    try:
+        return int(getattr(user, "pk", user))
+    except (TypeError, ValueError):
+        return None
+
+
+def accepted_edges(user):
+    """
+    Accesos aceptados donde participa el usuario, como un frozenset de
+    tuplas (owner_id, shared_with_id, role). Se guardan en el cache de Django
+    por usuario y los signals de SharedAccess los invalidan al cambiar.
+    Con SHARED_ACCESS_CACHE_TIMEOUT=0 (por defecto) no se cachea: el cache
+    solo es seguro si es compartido entre procesos (ver shared_access.checks).
+
+    Si `user` es una instancia (p. ej. request.user) el resultado además se
+    guarda en ella, así los chequeos repetidos de un mismo request no vuelven
+    a la base de datos aunque no haya cache.
+    """
+    generation = _generation
+    memo = getattr(user, "_accepted_edges", None)
+    if memo is not None and memo[0] == generation:
+        return memo[1]
+
+    user_id = _user_id(user)
+    timeout = settings.SHARED_ACCESS_CACHE_TIMEOUT
+    key = CACHE_KEY.format(user_id)
+    edges = cache.get(key) if timeout > 0 else None
+    if edges is None:
+        edges = frozenset(
+            SharedAccess.objects.filter(
+                models.Q(owner_id=user_id) | models.Q(shared_with_id=user_id), status="accepted"
+            ).values_list("owner_id", "shared_with_id", "role")
+        )
+        if timeout > 0:
+            cache.set(key, edges, timeout)
+    if isinstance(user, models.Model):
+        user._accepted_edges = (generation, edges)
+    return edges
+
+
+def has_access(user, patient, role=None):
+    """
+    True si `user` tiene un acceso aceptado a la información de `patient`
+    (y con ese rol, si se indica).
+    """
+    user_id, patient_id = _user_id(user), _user_id(patient)
+    if user_id is None or patient_id is None:
+        return False
+    roles = [role] if role else ROLES
+    edges = accepted_edges(user)
+    return any((patient_id, user_id, r) in edges for r in roles)
+
+
+def are_connected(user, other):
+    """
+    True si existe un acceso aceptado entre ambos usuarios, en cualquier dirección.
+    """
+    user_id, other_id = _user_id(user), _user_id(other)
+    if user_id is None or other_id is None:
+        return False
+    edges = accepted_edges(user)
+    return any((user_id, other_id, r) in edges or (other_id, user_id, r) in edges for r in ROLES)
+
+
+def invalidate(*users):
+    global _generation
+    _generation += 1
+    cache.delete_many([CACHE_KEY.format(_user_id(user)) for user in users if _user_id(user) is not None])
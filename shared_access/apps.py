@@ -6,4 +6,5 @@ class SharedAccessConfig(AppConfig):
     name = 'shared_access'
 
     def ready(self):
+        import shared_access.checks
         import shared_access.signals
\ No newline at end of file
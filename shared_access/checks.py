@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.core.checks import Error, register
+
+# Backend cuyo contenido no se comparte entre procesos
+PROCESS_LOCAL_CACHE = "django.core.cache.backends.locmem.LocMemCache"
+
+
+@register()
+def check_access_graph_cache(app_configs, **kwargs):
+    """
+    Cachear el grafo de accesos en un cache local al proceso dejaría un acceso
+    revocado vigente en los demás workers hasta que expire.
+    """
+    backend = settings.CACHES["default"]["BACKEND"]
+    if settings.SHARED_ACCESS_CACHE_TIMEOUT > 0 and backend == PROCESS_LOCAL_CACHE:
+        return [
+            Error(
+                "SHARED_ACCESS_CACHE_TIMEOUT > 0 requiere un cache compartido entre procesos.",
+                hint="Configure CACHE_BACKEND (p. ej. RedisCache) o deje SHARED_ACCESS_CACHE_TIMEOUT=0.",
+                obj=backend,
+                id="shared_access.E001",
+            )
+        ]
+    return []
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-17 16:21
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shared_access', '0002_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='accesshistory',
+            index=models.Index(fields=['owner', '-timestamp', '-id'], name='accesshistory_owner_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='accesshistory',
+            index=models.Index(fields=['shared_with', '-timestamp', '-id'], name='accesshistory_shared_ts_idx'),
+        ),
+    ]
@@ -84,5 +84,12 @@ class AccessHistory(models.Model):
     action = models.CharField(max_length=20, choices=ACTION_CHOICES)
     timestamp = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Orden estable para la paginación por cursor del historial
+            models.Index(fields=["owner", "-timestamp", "-id"], name="accesshistory_owner_ts_idx"),
+            models.Index(fields=["shared_with", "-timestamp", "-id"], name="accesshistory_shared_ts_idx"),
+        ]
+
     def __str__(self):
         return f"{self.get_action_display()} - {self.shared_with} ({self.timestamp.strftime('%Y-%m-%d %H:%M')})"
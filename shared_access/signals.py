@@ -1,12 +1,27 @@
 from django.db.models.signals import post_save, post_delete
+from django.db import transaction
 from django.dispatch import receiver
+from . import access_graph
 from .models import SharedAccess, AccessHistory
 
+
+def _invalidate_access_graph(instance):
+    """
+    Borra del cache los accesos de ambos usuarios. Se repite al hacer commit
+    para que una lectura concurrente no deje en cache el estado anterior.
+    """
+    users = (instance.owner_id, instance.shared_with_id)
+    access_graph.invalidate(*users)
+    transaction.on_commit(lambda: access_graph.invalidate(*users))
+
+
 @receiver(post_save, sender=SharedAccess)
 def create_access_history_on_save(sender, instance, created, **kwargs):
     """
     Registra eventos al crear o aceptar accesos.
     """
+    _invalidate_access_graph(instance)
+
     if created:
         action = "invited"
     elif instance.status is "accepted":
@@ -26,6 +41,7 @@ def create_access_history_on_delete(sender, instance, **kwargs):
     """
     Registra un evento cuando un acceso es revocado.
     """
+    _invalidate_access_graph(instance)
     AccessHistory.objects.create(
         shared_access=None,  # ya fue eliminado
         owner=instance.owner.user if hasattr(instance.owner, "user") else None,
@@ -1,3 +1,89 @@
-from django.test import TestCase
+from django.core.checks import Error
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from medications.models import Drug, DrugVariant, Medication
+from users.models import DoctorProfile, User
+
+from . import access_graph
+from .checks import check_access_graph_cache
+from .models import SharedAccess
+
+
+class AccessGraphTests(TestCase):
+    def setUp(self):
+        self.patient = User.objects.create_user(email="paciente@vitalis.local", password="x")
+        self.doctor = User.objects.create_user(email="doctor@vitalis.local", password="x")
+
+    def test_missing_or_invalid_user_has_no_access(self):
+        self.assertFalse(access_graph.has_access(self.doctor, None, role="doctor"))
+        self.assertFalse(access_graph.has_access(None, self.patient))
+        self.assertFalse(access_graph.has_access(self.doctor, "abc"))
+        self.assertFalse(access_graph.are_connected(self.doctor, None))
+
+    def test_revoked_access_is_denied_immediately(self):
+        access = SharedAccess.objects.create(
+            owner=self.patient, shared_with=self.doctor, role="doctor", status="accepted"
+        )
+        self.assertTrue(access_graph.has_access(self.doctor, self.patient, role="doctor"))
+
+        access.delete()
+        self.assertFalse(access_graph.has_access(self.doctor, self.patient, role="doctor"))
+
+    @override_settings(SHARED_ACCESS_CACHE_TIMEOUT=0)
+    def test_repeated_checks_are_memoized_on_the_user(self):
+        SharedAccess.objects.create(owner=self.patient, shared_with=self.doctor, role="doctor", status="accepted")
+        doctor = User.objects.get(pk=self.doctor.pk)
+
+        with self.assertNumQueries(1):
+            self.assertTrue(access_graph.has_access(doctor, self.patient, role="doctor"))
+            self.assertTrue(access_graph.has_access(doctor, self.patient.pk))
+            self.assertTrue(access_graph.are_connected(doctor, self.patient))
+            self.assertFalse(access_graph.has_access(doctor, self.doctor))
+        # Con solo el id no hay dónde guardarlo: cada chequeo consulta
+        with self.assertNumQueries(2):
+            access_graph.has_access(self.doctor.pk, self.patient)
+            access_graph.has_access(self.doctor.pk, self.patient)
+
+    @override_settings(
+        SHARED_ACCESS_CACHE_TIMEOUT=300,
+        CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+    )
+    def test_check_rejects_process_local_cache(self):
+        errors = check_access_graph_cache(None)
+        self.assertEqual([e.id for e in errors], ["shared_access.E001"])
+        self.assertIsInstance(errors[0], Error)
+
+    @override_settings(SHARED_ACCESS_CACHE_TIMEOUT=0)
+    def test_check_allows_disabled_cache(self):
+        self.assertEqual(check_access_graph_cache(None), [])
+
+
+class DoctorReminderAccessTests(TestCase):
+    def test_create_without_patient_is_forbidden(self):
+        doctor = User.objects.create_user(email="doctor@vitalis.local", password="x")
+        DoctorProfile.objects.create(user=doctor, license_number="1", specialty="general")
+        drug = Drug.objects.create(name="amoxicilina")
+        variant = DrugVariant.objects.create(drug=drug, variant_name="500 mg", dosage="500 mg")
+        medication = Medication.objects.create(
+            patient=doctor,
+            drug_variant=variant,
+            dosage_instructions="cada 8 horas",
+            start_date=timezone.localdate(),
+            end_date=timezone.localdate(),
+        )
+
+        client = APIClient()
+        client.force_authenticate(doctor)
+        response = client.post(
+            "/api/reminders/doctor/reminders/",
+            {
+                "medication": medication.pk,
+                "title": "amoxicilina",
+                "start_time": timezone.now().isoformat(),
+                "frequency": "daily",
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, 403)
@@ -18,6 +18,7 @@ class SharedAccessViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
     serializer_class = SharedAccessSerializer
     queryset = SharedAccess.objects.all()
+    cursor_ordering = ("-created_at", "-id")
 
     def get_queryset(self):
         user = self.request.user
@@ -112,6 +113,7 @@ class AccessHistoryViewSet(viewsets.ReadOnlyModelViewSet):
     """
     serializer_class = AccessHistorySerializer
     permission_classes = [IsAuthenticated]
+    cursor_ordering = ("-timestamp", "-id")
 
     def get_queryset(self):
         user = self.request.user
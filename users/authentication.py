@@ -0,0 +1,50 @@
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication as BaseJWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from .tokens import has_identity_claims, user_from_claims
+
+
+class JWTAuthentication(BaseJWTAuthentication):
+    """
+    Igual que la autenticación JWT de simplejwt, pero carga el usuario con
+    User.objects.with_access(): roles y perfiles quedan resueltos en la misma
+    query y los permisos ya no consultan la base de datos en cada request.
+
+    Con JWT_STATELESS_AUTH=True y un token emitido con claims de identidad
+    (users.tokens), el usuario se arma desde el token sin ninguna query.
+    Un usuario desactivado o un cambio de rol se notan al expirar el access
+    token (o al refrescarlo), no antes.
+    """
+
+    def get_user(self, validated_token):
+        if (
+            settings.JWT_STATELESS_AUTH
+            and not api_settings.CHECK_REVOKE_TOKEN
+            and has_identity_claims(validated_token)
+        ):
+            if api_settings.USER_ID_CLAIM not in validated_token:
+                raise InvalidToken(_("Token contained no recognizable user identification"))
+            return user_from_claims(validated_token)
+
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_("Token contained no recognizable user identification")) from e
+
+        try:
+            user = self.user_model.objects.with_access().get(**{api_settings.USER_ID_FIELD: user_id})
+        except self.user_model.DoesNotExist as e:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found") from e
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+
+        return user
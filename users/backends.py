@@ -0,0 +1,34 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+UserModel = get_user_model()
+
+
+class EmailBackend(ModelBackend):
+    """
+    ModelBackend que carga el usuario con User.objects.with_access(): el login
+    obtiene en una sola query el usuario, sus perfiles y sus roles.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return
+        # create_user normaliza el dominio del email; se busca también el valor tal
+        # cual llega para las cuentas registradas antes de normalizar.
+        normalized = UserModel._default_manager.normalize_email(username)
+        candidates = list(
+            UserModel._default_manager.with_access().filter(
+                **{f"{UserModel.USERNAME_FIELD}__in": {username, normalized}}
+            )
+        )
+        user = next(
+            (c for c in candidates if getattr(c, UserModel.USERNAME_FIELD) == normalized),
+            candidates[0] if candidates else None,
+        )
+        if user is None:
+            # Igual que ModelBackend: hashea una vez para no revelar si el email existe
+            UserModel().set_password(password)
+        elif user.check_password(password) and self.user_can_authenticate(user):
+            return user
@@ -0,0 +1,57 @@
+import time
+from contextlib import nullcontext
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from users.serializers import LoginSerializer, RegisterSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide registros/s y logins/s con los serializers reales, y las queries por operación. "
+        "Los usuarios se crean dentro de una transacción que se revierte al terminar."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=200, help="Usuarios a registrar y luego autenticar")
+        parser.add_argument(
+            "--fast-hasher",
+            action="store_true",
+            help="Usa MD5 para medir solo el costo de base de datos (sin el hash PBKDF2)",
+        )
+
+    def handle(self, *args, **options):
+        hashers = ["django.contrib.auth.hashers.MD5PasswordHasher"] if options["fast_hasher"] else None
+        with override_settings(PASSWORD_HASHERS=hashers) if hashers else nullcontext():
+            with transaction.atomic():
+                self._run(options["users"])
+                transaction.set_rollback(True)
+
+    def _run(self, count):
+        credentials = [(f"benchmark-auth-{i}@vitalis.local", f"password-{i}") for i in range(count)]
+
+        with CaptureQueriesContext(connection) as register_queries:
+            start = time.perf_counter()
+            for email, password in credentials:
+                serializer = RegisterSerializer(data={"email": email, "password": password})
+                serializer.is_valid(raise_exception=True)
+                serializer.save()
+            register_elapsed = time.perf_counter() - start
+
+        with CaptureQueriesContext(connection) as login_queries:
+            start = time.perf_counter()
+            for email, password in credentials:
+                LoginSerializer(data={"email": email, "password": password}).is_valid(raise_exception=True)
+            login_elapsed = time.perf_counter() - start
+
+        self.stdout.write(
+            f"registro: {count / register_elapsed:8.1f}/s, "
+            f"{len(register_queries) / count:.1f} queries por registro"
+        )
+        self.stdout.write(
+            f"login:    {count / login_elapsed:8.1f}/s, "
+            f"{len(login_queries) / count:.1f} queries por login"
+        )
+
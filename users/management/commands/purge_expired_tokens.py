@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from users.tokens import purge_expired_tokens
+
+
+class Command(BaseCommand):
+    help = (
+        "Borra los refresh tokens expirados de la blacklist de JWT (OutstandingToken y "
+        "BlacklistedToken) en lotes cortos, sin bloquear las tablas durante toda la purga."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=settings.JWT_PURGE_BATCH_SIZE,
+            help="Tokens borrados por transacción",
+        )
+        parser.add_argument("--pause", type=float, default=0, help="Segundos de espera entre lotes")
+
+    def handle(self, *args, **options):
+        deleted = purge_expired_tokens(batch_size=options["batch_size"], pause=options["pause"])
+        self.stdout.write(self.style.SUCCESS(f"{deleted} tokens expirados borrados."))
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.6 on 2026-10-17 16:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_customfcmdevice'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customfcmdevice',
+            index=models.Index(fields=['registration_id'], name='fcmdevice_registration_idx'),
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.contrib.auth.models import AbstractUser,BaseUserManager
 from django.db import models
+from django.utils.functional import cached_property
 from fcm_django.models import AbstractFCMDevice
 
 
@@ -19,6 +20,34 @@ class CustomUserManager(BaseUserManager):
         extra_fields.setdefault("is_superuser", True)
         return self.create_user(email, password, **extra_fields)
 
+    def with_access(self):
+        """
+        Carga en una sola query lo que revisan los permisos: los perfiles de
+        paciente, doctor y familiar (LEFT JOIN) y los roles como una máscara de
+        bits (`role_mask`, un bit por Role.ROLE_CHOICES) en una subconsulta.
+        El queryset base se arma una vez y se clona: construir las expresiones
+        en cada request costaba más que la propia query.
+        """
+        if getattr(self, "_with_access", None) is None:
+            role_bits = [
+                models.When(role__name=name, then=models.Value(1 << bit))
+                for bit, (name, _) in enumerate(Role.ROLE_CHOICES)
+            ]
+            role_mask = (
+                UserRole.objects.filter(user=models.OuterRef("pk"))
+                .order_by()
+                .values("user")
+                .annotate(mask=models.Sum(models.Case(*role_bits, default=models.Value(0))))
+                .values("mask")
+            )
+            self._with_access = self.select_related(
+                "patient_profile", "doctor_profile", "family_profile"
+            ).annotate(role_mask=models.Subquery(role_mask))
+        return self._with_access.all()
+
+
+PROFILE_NAMES = ("patient", "doctor", "family")
+
 
 class User(AbstractUser):
     username = None 
@@ -36,6 +65,45 @@ class User(AbstractUser):
 
     def __str__(self):
         return f"{self.first_name} {self.last_name} <{self.email}>"
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        """
+        En un usuario armado desde los claims del token (users.tokens.user_from_claims)
+        el primer campo diferido que se lee carga todos los demás en la misma query,
+        en lugar de una query por campo al serializarlo.
+        """
+        if fields is not None and self.__dict__.pop("_load_deferred_together", False):
+            fields = set(fields) | self.get_deferred_fields()
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+
+    @cached_property
+    def role_names(self):
+        """
+        Roles del usuario. Si se cargó con User.objects.with_access() se leen
+        de las anotaciones; si no, se consultan una sola vez por instancia.
+        """
+        if hasattr(self, "role_mask"):
+            mask = self.role_mask or 0
+            return frozenset(name for bit, (name, _) in enumerate(Role.ROLE_CHOICES) if mask & (1 << bit))
+        return frozenset(self.roles.values_list("role__name", flat=True))
+
+    def has_role(self, name):
+        return name in self.role_names
+
+    @cached_property
+    def profile_ids(self):
+        """
+        Ids de los perfiles del usuario, p. ej. {"patient": 3, "doctor": None, "family": 7}.
+        Sin queries si los perfiles vienen de with_access() o de los claims del token.
+        """
+        ids = {}
+        for name in PROFILE_NAMES:
+            profile = getattr(self, f"{name}_profile", None)
+            ids[name] = profile.pk if profile else None
+        return ids
+
+    def has_profile(self, name):
+        return self.profile_ids.get(name) is not None
     
 
 class Role(models.Model):
@@ -93,4 +161,8 @@ class CustomFCMDevice(AbstractFCMDevice):
 
     class Meta:
         verbose_name = "Dispositivo FCM"
-        verbose_name_plural = "Dispositivos FCM"
\ No newline at end of file
+        verbose_name_plural = "Dispositivos FCM"
+        indexes = [
+            # Depuración de tokens inválidos tras cada lote de envíos
+            models.Index(fields=["registration_id"], name="fcmdevice_registration_idx"),
+        ]
\ No newline at end of file
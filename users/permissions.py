@@ -11,7 +11,8 @@ class IsDoctorOfPatient(BasePermission):
             return False
 
         # El usuario debe tener perfil de doctor
-        if not hasattr(request.user, "doctor_profile"):
+        doctor_profile_id = request.user.profile_ids["doctor"]
+        if doctor_profile_id is None:
             return False
 
         patient_id = view.kwargs.get("patient_id")
@@ -25,7 +26,7 @@ class IsDoctorOfPatient(BasePermission):
 
         # Aquí verificamos asignación: se puede tener una relación DoctorProfile -> PatientProfile
         # Por simplicidad, asumimos que cada paciente tiene un campo `assigned_doctors`
-        return patient.assigned_doctors.filter(id=request.user.doctor_profile.id).exists()
+        return patient.assigned_doctors.filter(id=doctor_profile_id).exists()
 
 class IsCaregiverOfPatient(BasePermission):
     """
@@ -37,7 +38,8 @@ class IsCaregiverOfPatient(BasePermission):
             return False
 
         # El familiar debe tener un perfil de familia
-        if not hasattr(request.user, "family_profile"):
+        family_profile_id = request.user.profile_ids["family"]
+        if family_profile_id is None:
             return False
 
         patient_id = view.kwargs.get("patient_id")  # tomado de la URL
@@ -45,14 +47,14 @@ class IsCaregiverOfPatient(BasePermission):
             return False
 
         # Verificamos si el paciente está en su lista de cuidados
-        return request.user.family_profile.related_patients.filter(id=patient_id).exists()
+        return PatientProfile.objects.filter(id=patient_id, caregivers__id=family_profile_id).exists()
 
 class IsPatient(BasePermission):
     """
     Permite acceso solo si el usuario tiene el rol de paciente.
     """
     def has_permission(self, request, view):
-        return request.user.is_authenticated and request.user.roles.filter(role__name="patient").exists()
+        return request.user.is_authenticated and request.user.has_role("patient")
 
 
 class IsFamily(BasePermission):
@@ -60,7 +62,7 @@ class IsFamily(BasePermission):
     Permite acceso solo si el usuario tiene el rol de familiar.
     """
     def has_permission(self, request, view):
-        return request.user.is_authenticated and request.user.roles.filter(role__name="family").exists()
+        return request.user.is_authenticated and request.user.has_role("family")
 
 
 class IsDoctor(BasePermission):
@@ -68,4 +70,4 @@ class IsDoctor(BasePermission):
     Permite acceso solo si el usuario tiene el rol de doctor.
     """
     def has_permission(self, request, view):
-        return request.user.is_authenticated and request.user.roles.filter(role__name="doctor").exists()
\ No newline at end of file
+        return request.user.is_authenticated and request.user.has_role("doctor")
\ No newline at end of file
@@ -1,13 +1,26 @@
 # users/serializers.py
 from rest_framework import serializers
+from rest_framework.validators import UniqueValidator
 from django.contrib.auth import get_user_model, authenticate
 from rest_framework.authtoken.models import Token
-from .models import Role, UserRole, PatientProfile, FamilyProfile, DoctorProfile
-from rest_framework_simplejwt.tokens import RefreshToken
+from django.db import transaction
+from .models import PROFILE_NAMES, Role, UserRole, PatientProfile, FamilyProfile, DoctorProfile
+from .tokens import IdentityRefreshToken
 
 User = get_user_model()
 
 
+class NormalizedEmailField(serializers.EmailField):
+    """
+    EmailField que normaliza el email como User.objects.create_user (dominio
+    en minúsculas) antes de correr los validadores, para que la unicidad se
+    compruebe sobre el valor que realmente se guarda.
+    """
+
+    def to_internal_value(self, data):
+        return User.objects.normalize_email(super().to_internal_value(data))
+
+
 class LoginSerializer(serializers.Serializer):
     email = serializers.EmailField()
     password = serializers.CharField(write_only=True)
@@ -20,16 +33,10 @@ class LoginSerializer(serializers.Serializer):
         if not user:
             raise serializers.ValidationError("Credenciales inválidas")
 
-        refresh = RefreshToken.for_user(user)
+        refresh = IdentityRefreshToken.for_user(user)
 
-        # Detectar roles
-        roles = []
-        if hasattr(user, "patient_profile"):
-            roles.append("patient")
-        if hasattr(user, "doctor_profile"):
-            roles.append("doctor")
-        if hasattr(user, "family_profile"):
-            roles.append("family")
+        # Detectar roles (los perfiles ya vienen cargados por users.backends.EmailBackend)
+        roles = [name for name in PROFILE_NAMES if user.has_profile(name)]
 
         return {
             "id": user.id,
@@ -46,20 +53,24 @@ class LoginSerializer(serializers.Serializer):
 
 
 class RegisterSerializer(serializers.ModelSerializer):
+    # iexact: "ana@GMAIL.com" no debe pasar la validación si ya existe "ana@gmail.com"
+    email = NormalizedEmailField(
+        max_length=User._meta.get_field("email").max_length,
+        validators=[UniqueValidator(queryset=User.objects.all(), lookup="iexact")],
+    )
     password = serializers.CharField(write_only=True)
 
     class Meta:
         model = User
         fields = ["id", "email", "first_name", "last_name", "phone_number", "password"]
 
+    @transaction.atomic
     def create(self, validated_data):
-        # Crear usuario
+        # Crear usuario con la contraseña ya hasheada (un solo INSERT)
         password = validated_data.pop("password")
-        user = User.objects.create(**validated_data)
-        user.set_password(password)
-        user.save()
+        user = User.objects.create_user(password=password, **validated_data)
 
-        # Crear perfiles automáticamente
+        # Crear perfiles automáticamente, en la misma transacción
         PatientProfile.objects.create(user=user)
         FamilyProfile.objects.create(user=user)
 
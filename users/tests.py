@@ -1,3 +1,114 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
 
-# Create your tests here.
+from . import tokens
+from .authentication import JWTAuthentication
+from .models import User
+
+
+class EmailNormalizationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_login_with_mixed_case_domain_after_register(self):
+        response = self.client.post(
+            "/api/users/register/", {"email": "Ana@Gmail.COM", "password": "secreta-123"}, format="json"
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(User.objects.filter(email="Ana@gmail.com").exists())
+
+        response = self.client.post(
+            "/api/users/login/", {"email": "Ana@Gmail.COM", "password": "secreta-123"}, format="json"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["email"], "Ana@gmail.com")
+
+    def test_register_duplicate_with_different_case_is_rejected(self):
+        User.objects.create_user(email="ana@gmail.com", password="secreta-123")
+
+        response = self.client.post(
+            "/api/users/register/", {"email": "ana@GMAIL.com", "password": "secreta-123"}, format="json"
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("email", response.json())
+        self.assertEqual(User.objects.count(), 1)
+
+    def test_login_with_legacy_unnormalized_email(self):
+        # Cuentas creadas antes de normalizar guardaron el email tal cual
+        legacy = User(email="Luis@Example.COM")
+        legacy.set_password("secreta-123")
+        legacy.save()
+
+        response = self.client.post(
+            "/api/users/login/", {"email": "Luis@Example.COM", "password": "secreta-123"}, format="json"
+        )
+        self.assertEqual(response.status_code, 200)
+
+
+@override_settings(JWT_STATELESS_AUTH=True)
+class StatelessAuthenticationTests(TestCase):
+    def test_deferred_fields_load_in_one_query(self):
+        user = User.objects.create_user(
+            email="ana@vitalis.local", password="x", first_name="Ana", last_name="Pérez", phone_number="123"
+        )
+        access = tokens.IdentityRefreshToken.for_user(user).access_token
+        request = APIRequestFactory().get("/", HTTP_AUTHORIZATION=f"Bearer {access}")
+
+        with self.assertNumQueries(0):
+            authenticated, _ = JWTAuthentication().authenticate(request)
+            self.assertEqual((authenticated.pk, authenticated.email), (user.pk, user.email))
+        # Como al serializarlo (p. ej. patient_name y patient_last_name de un recordatorio)
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                (authenticated.first_name, authenticated.last_name, authenticated.phone_number),
+                ("Ana", "Pérez", "123"),
+            )
+            self.assertEqual(authenticated.created_at, user.created_at)
+        self.assertEqual(authenticated.get_deferred_fields(), set())
+
+
+class TokenRefreshTests(TestCase):
+    url = "/api/users/refresh/"
+
+    def setUp(self):
+        self.client = APIClient()
+        User.objects.create_user(email="ana@vitalis.local", password="secreta-123")
+        response = self.client.post(
+            "/api/users/login/", {"email": "ana@vitalis.local", "password": "secreta-123"}, format="json"
+        )
+        self.refresh = response.json()["tokens"]["refresh"]
+        tokens.recent_blacklist = tokens.RecentBlacklist(100)
+
+    def test_refresh_query_count(self):
+        # usuario, id del token, INSERT en la blacklist, INSERT del nuevo token (+ savepoint)
+        with self.assertNumQueries(6):
+            response = self.client.post(self.url, {"refresh": self.refresh}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("access", response.json())
+        self.assertNotEqual(response.json()["refresh"], self.refresh)
+        self.assertEqual(BlacklistedToken.objects.count(), 1)
+        self.assertEqual(OutstandingToken.objects.count(), 2)
+
+        # El nuevo token también sirve
+        response = self.client.post(self.url, {"refresh": response.json()["refresh"]}, format="json")
+        self.assertEqual(response.status_code, 200)
+
+    def test_replay_is_rejected_from_memory(self):
+        self.client.post(self.url, {"refresh": self.refresh}, format="json")
+        with self.assertNumQueries(0):
+            response = self.client.post(self.url, {"refresh": self.refresh}, format="json")
+        self.assertEqual(response.status_code, 401)
+
+    def test_replay_is_rejected_by_another_process(self):
+        self.client.post(self.url, {"refresh": self.refresh}, format="json")
+        # Otro proceso no tiene el JTI en memoria: lo detecta el INSERT en la blacklist
+        tokens.recent_blacklist = tokens.RecentBlacklist(100)
+        response = self.client.post(self.url, {"refresh": self.refresh}, format="json")
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(OutstandingToken.objects.count(), 2)
+
+    def test_inactive_user_cannot_refresh(self):
+        User.objects.filter(email="ana@vitalis.local").update(is_active=False)
+        response = self.client.post(self.url, {"refresh": self.refresh}, format="json")
+        self.assertEqual(response.status_code, 401)
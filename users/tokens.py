@@ -0,0 +1,217 @@
+import threading
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, TokenError
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer as BaseTokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.utils import aware_utcnow, datetime_from_epoch
+
+from .models import User
+
+# Campos del usuario que viajan en el token; el resto queda diferido
+CLAIMED_FIELDS = ("email", "is_active", "is_staff", "is_superuser")
+
+
+def set_identity_claims(token, user):
+    """
+    Copia en el token lo que necesitan los permisos: email, flags de staff,
+    roles y ids de perfiles. El access token hereda estos claims del refresh.
+    """
+    for field in CLAIMED_FIELDS:
+        token[field] = getattr(user, field)
+    token["roles"] = sorted(user.role_names)
+    token["profiles"] = user.profile_ids
+
+
+def has_identity_claims(token):
+    return "roles" in token and "profiles" in token
+
+
+def user_from_claims(token):
+    """
+    Usuario construido solo con los claims del token, sin query. Los demás
+    campos quedan diferidos: se cargan todos juntos, en una query, la primera
+    vez que se lee alguno (ver User.refresh_from_db), y save() solo escribe
+    los campos cargados.
+    """
+    user_id = User._meta.pk.to_python(token[api_settings.USER_ID_CLAIM])  # simplejwt lo guarda como str
+    values = {"id": user_id, **{field: token[field] for field in CLAIMED_FIELDS}}
+    field_names = [f.attname for f in User._meta.concrete_fields if f.attname in values]
+    user = User.from_db(DEFAULT_DB_ALIAS, field_names, [values[name] for name in field_names])
+    user.__dict__["role_names"] = frozenset(token["roles"])
+    user.__dict__["profile_ids"] = dict(token["profiles"])
+    user._load_deferred_together = True
+    return user
+
+
+class RecentBlacklist:
+    """
+    JTIs que este proceso vio en la blacklist, con su expiración. Un token
+    rotado que se reintenta se rechaza sin consultar la tabla. Es acotado:
+    al llenarse descarta primero los más antiguos.
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def add(self, jti, exp):
+        with self._lock:
+            self._entries.pop(jti, None)
+            self._entries[jti] = exp
+            while len(self._entries) > self.max_size:
+                self._entries.pop(next(iter(self._entries)))
+
+    def __contains__(self, jti):
+        with self._lock:
+            exp = self._entries.get(jti)
+            if exp is not None and exp <= time.time():
+                del self._entries[jti]
+                return False
+            return exp is not None
+
+
+recent_blacklist = RecentBlacklist(settings.JWT_BLACKLIST_CACHE_SIZE)
+
+
+class IdentityRefreshToken(RefreshToken):
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        set_identity_claims(token, user)
+        return token
+
+    def check_blacklist(self):
+        jti = self.payload[api_settings.JTI_CLAIM]
+        if jti in recent_blacklist:
+            raise TokenError(_("Token is blacklisted"))
+        try:
+            super().check_blacklist()
+        except TokenError:
+            recent_blacklist.add(jti, self.payload["exp"])
+            raise
+
+    def blacklist(self):
+        result = super().blacklist()
+        recent_blacklist.add(self.payload[api_settings.JTI_CLAIM], self.payload["exp"])
+        return result
+
+
+def purge_expired_tokens(batch_size=None, pause=0):
+    """
+    Borra los tokens expirados (OutstandingToken y su BlacklistedToken) en
+    lotes pequeños, cada uno en su propia transacción, para no mantener
+    locks largos sobre las tablas que usa el refresh. Recorre por id: con
+    una vida fija, los ids más viejos son los primeros en expirar y cada lote
+    se resuelve con el índice de la PK. Devuelve cuántos tokens borró.
+    """
+    batch_size = batch_size or settings.JWT_PURGE_BATCH_SIZE
+    now = aware_utcnow()
+    deleted = 0
+    while True:
+        with transaction.atomic():
+            ids = list(
+                OutstandingToken.objects.filter(expires_at__lte=now)
+                .order_by("id")
+                .values_list("id", flat=True)[:batch_size]
+            )
+            if not ids:
+                return deleted
+            BlacklistedToken.objects.filter(token_id__in=ids).delete()
+            OutstandingToken.objects.filter(id__in=ids).delete()
+        deleted += len(ids)
+        if pause:
+            time.sleep(pause)
+
+
+class RotatingRefreshToken(IdentityRefreshToken):
+    """
+    Refresh token recibido por TokenRefreshSerializer. Con rotación y
+    blacklist tras rotar, cada refresh token se usa una sola vez: en lugar de
+    consultar la blacklist al verificarlo, el reuso se detecta al insertarlo
+    en ella (rotate), que hay que hacer de todos modos. Al verificar solo se
+    mira recent_blacklist, en memoria.
+    """
+
+    def check_blacklist(self):
+        if self.payload[api_settings.JTI_CLAIM] in recent_blacklist:
+            raise TokenError(_("Token is blacklisted"))
+
+    def rotate(self, user):
+        """
+        Pasa este token a la blacklist y lo convierte en uno nuevo para `user`,
+        registrado como OutstandingToken. Lanza TokenError si el token ya
+        estaba en la blacklist. Debe correr dentro de una transacción.
+        """
+        jti, exp = self.payload[api_settings.JTI_CLAIM], self.payload["exp"]
+        outstanding_id = OutstandingToken.objects.filter(jti=jti).values_list("id", flat=True).first()
+        if outstanding_id is None:
+            outstanding_id = OutstandingToken.objects.create(
+                user=user,
+                jti=jti,
+                token=str(self),
+                created_at=self.current_time,
+                expires_at=datetime_from_epoch(exp),
+            ).id
+        try:
+            BlacklistedToken.objects.create(token_id=outstanding_id)
+        except IntegrityError:
+            # Ya estaba: el token se reusó (la transacción se revierte al propagar el error)
+            recent_blacklist.add(jti, exp)
+            raise TokenError(_("Token is blacklisted"))
+        recent_blacklist.add(jti, exp)
+
+        self.set_jti()
+        self.set_exp()
+        self.set_iat()
+        OutstandingToken.objects.create(
+            user=user,
+            jti=self.payload[api_settings.JTI_CLAIM],
+            token=str(self),
+            created_at=self.current_time,
+            expires_at=datetime_from_epoch(self.payload["exp"]),
+        )
+
+
+class TokenRefreshSerializer(BaseTokenRefreshSerializer):
+    """
+    Al refrescar vuelve a leer roles y perfiles, así un cambio de rol llega
+    al siguiente access token en lugar de esperar a un nuevo login.
+    Reemplaza por completo el validate de simplejwt: el token se verifica una
+    vez, el usuario se lee una vez (con with_access) y la blacklist se
+    consulta con el mismo INSERT que la actualiza (RotatingRefreshToken).
+    """
+    token_class = RotatingRefreshToken
+
+    def validate(self, attrs):
+        rotating = api_settings.ROTATE_REFRESH_TOKENS and api_settings.BLACKLIST_AFTER_ROTATION
+        refresh = self.token_class(attrs["refresh"])
+        if not rotating:
+            # Sin blacklist al rotar el token puede reusarse: se consulta la tabla
+            IdentityRefreshToken.check_blacklist(refresh)
+
+        user = User.objects.with_access().filter(pk=refresh.get(api_settings.USER_ID_CLAIM)).first()
+        if user is None or not api_settings.USER_AUTHENTICATION_RULE(user):
+            raise AuthenticationFailed(self.error_messages["no_active_account"], "no_active_account")
+        set_identity_claims(refresh, user)
+
+        if rotating:
+            with transaction.atomic():
+                access = str(refresh.access_token)
+                refresh.rotate(user)
+            return {"access": access, "refresh": str(refresh)}
+
+        data = {"access": str(refresh.access_token)}
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            refresh.outstand()
+            data["refresh"] = str(refresh)
+        return data
@@ -0,0 +1,22 @@
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Paginación por cursor (keyset) para todos los listados de la API.
+    Evita OFFSET: cada página filtra por la posición del último elemento,
+    así el tiempo de respuesta no crece con el historial.
+
+    Cada vista declara su orden estable e indexado en `cursor_ordering`,
+    p. ej. ("-taken_at", "-id"); si no, se ordena por "-id".
+    """
+    page_size_query_param = "page_size"
+    max_page_size = settings.API_MAX_PAGE_SIZE
+    ordering = ("-id",)
+
+    def get_ordering(self, request, queryset, view):
+        ordering = getattr(view, "cursor_ordering", None)
+        if ordering:
+            return (ordering,) if isinstance(ordering, str) else tuple(ordering)
+        return super().get_ordering(request, queryset, view)
@@ -11,4 +11,4 @@ class IsAdminOrReadOnly(BasePermission):
 class IsDoctor(BasePermission):
     """Solo doctores pueden crear diagnósticos o prescripciones."""
     def has_permission(self, request, view):
-        return hasattr(request.user, "doctor_profile")
+        return request.user.is_authenticated and request.user.has_profile("doctor")